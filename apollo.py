@@ -6,9 +6,12 @@ import discord
 from discord import Intents
 from discord.ext import commands
 from discord.ext.commands import Bot, Context, check, errors, when_mentioned_or
+from sqlalchemy.exc import SQLAlchemyError
 
 from config import CONFIG
+from models import db_session, engine, get_async_engine
 from utils.custom_help import SimplePrettyHelp
+from utils.query_stats import finish_tracking, instrument_engine, start_tracking
 from utils.utils import done_react, is_compsoc_exec_in_guild, wait_react
 
 DESCRIPTION = """
@@ -55,6 +58,7 @@ EXTENSIONS = [
     "cogs.channel_checker",
     "cogs.database",
     "cogs.irc",
+    "cogs.message_dispatch",
     "cogs.parallelism",
     "cogs.welcome",
 ]
@@ -80,6 +84,16 @@ async def reload_cogs(ctx: Context[Bot]):
     await ctx.message.add_reaction("✅")
 
 
+@bot.before_invoke
+async def track_command_queries(ctx: Context[Bot]):
+    start_tracking(f"command {ctx.command}")
+
+
+@bot.after_invoke
+async def finish_command_queries(ctx: Context[Bot]):
+    finish_tracking()
+
+
 @bot.event
 async def on_ready():
     logging.info("Logged in as")
@@ -97,6 +111,9 @@ async def main():
         ],
     )
 
+    instrument_engine(engine)
+    instrument_engine(get_async_engine().sync_engine)
+
     async with bot:
         for extension in EXTENSIONS:
             try:
@@ -105,6 +122,7 @@ async def main():
             except Exception as e:
                 logging.exception("Failed to load extension {extension}", exc_info=e)
         await bot.start(CONFIG.DISCORD_TOKEN)
+    await get_async_engine().dispose()
 
 
 @bot.command()
@@ -125,6 +143,10 @@ async def on_command_error(ctx: Context[Bot], error: Exception):
     # await ctx.message.add_reaction("🚫")
     message = ""
     reraise = None
+    if isinstance(error, SQLAlchemyError):
+        # Otherwise the shared session stays in the failed transaction, and every later
+        # use of it fails too (e.g. after the database restarts)
+        db_session.rollback()
     # Custom discord parsing error messages
     if isinstance(error, errors.CommandNotFound):
         pass
@@ -0,0 +1,50 @@
+"""Compare the karma parser engines on long messages.
+
+Run from the repository root with `python -m benchmarks.karma_parser`.
+"""
+
+import random
+import timeit
+
+from karma.parser import PARSER_ENGINES, parse_message_content
+
+MESSAGE_LENGTH = 2000
+REPEATS = 20
+
+WORDS = ["apollo", "karma", "the", "for", "a", "because", "uwcs", "c", "python"]
+KARMA = ["foo++", "bar--", "baz+-", '"quoted topic"++', "thing++ (reason)"]
+
+
+def make_message(rng: random.Random, karma_ratio: float) -> str:
+    words = []
+    while sum(len(w) + 1 for w in words) < MESSAGE_LENGTH:
+        pool = KARMA if rng.random() < karma_ratio else WORDS
+        words.append(rng.choice(pool))
+    return " ".join(words)[:MESSAGE_LENGTH]
+
+
+def main():
+    rng = random.Random(0)
+    messages = {
+        "prose, no karma": make_message(rng, 0),
+        "prose, some karma": make_message(rng, 0.05),
+        "karma heavy": make_message(rng, 0.5),
+        "single word": "a" * (MESSAGE_LENGTH - 2) + "++",
+    }
+
+    for name, message in messages.items():
+        results = {
+            engine: parse_message_content(message, engine) for engine in PARSER_ENGINES
+        }
+        assert len({repr(r) for r in results.values()}) == 1, f"{name}: engines differ"
+
+        print(f"{name} ({len(message)} chars, {len(results['parsita'])} items)")
+        for engine in PARSER_ENGINES:
+            seconds = timeit.timeit(
+                lambda: parse_message_content(message, engine), number=REPEATS
+            )
+            print(f"  {engine:>8}: {1000 * seconds / REPEATS:8.3f} ms/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Replay a synthetic message stream through the karma pipeline against a seeded database.
+
+Each message goes through process_karma (which parses it with parse_message_content),
+and the throughput, latency and queries per message are reported by kind.
+
+Run from the repository root with `python -m benchmarks.karma_pipeline`. By default the
+database is an in-memory SQLite one; pass `--database` the URL of an empty scratch
+database (e.g. Postgres) to benchmark that instead.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, List
+
+import pretend
+from sqlalchemy import create_engine, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from karma.karma import process_karma
+from models import Base
+from models.karma import Karma, KarmaChange
+from models.user import User
+from tests.stubs import make_message_stub
+from utils.query_stats import instrument_engine, track_queries
+
+WORDS = ["apollo", "karma", "the", "for", "a", "because", "uwcs", "c", "python"]
+REASONS = ["for being great", "for the pizza", "because it's true", "obviously"]
+
+# Roughly the mix of messages a busy server sees
+MESSAGE_KINDS = {
+    "no karma": 0.80,
+    "one topic": 0.14,
+    "one topic, reason": 0.03,
+    "several topics": 0.02,
+    "new topic": 0.01,
+}
+
+
+def seed(
+    db_session: Session, rng: random.Random, topics: int, users: int, changes: int
+):
+    """Fill the karma tables with changes spread over five years.
+
+    Topic popularity follows a Zipf distribution, so a few topics have most changes.
+    """
+    db_session.execute(
+        insert(User),
+        [{"user_uid": 10**17 + i, "username": f"user{i}"} for i in range(users)],
+    )
+    db_session.execute(
+        insert(Karma),
+        [{"name": f"topic{i}", "normalised_name": f"topic{i}"} for i in range(topics)],
+    )
+    user_ids = db_session.scalars(select(User.id)).all()
+    karma_ids = db_session.scalars(select(Karma.id).order_by(Karma.id)).all()
+
+    start = datetime.utcnow() - timedelta(days=5 * 365)
+    spacing = timedelta(days=5 * 365) / max(changes, 1)
+    totals: Dict[int, Dict[str, int | datetime]] = {}
+    rows = []
+    weights = [1 / rank for rank in range(1, topics + 1)]
+    for message_id, karma_id in enumerate(rng.choices(karma_ids, weights, k=changes)):
+        change = rng.choice([1, 1, 1, 0, -1])
+        created_at = start + message_id * spacing
+        topic = totals.setdefault(
+            karma_id, {"id": karma_id, "pluses": 0, "minuses": 0, "neutrals": 0}
+        )
+        topic["score"] = topic.get("score", 0) + change
+        topic[{1: "pluses", 0: "neutrals", -1: "minuses"}[change]] += 1
+        topic["last_changed_at"] = created_at
+        rows.append(
+            {
+                "karma_id": karma_id,
+                "user_id": rng.choice(user_ids),
+                "message_id": message_id,
+                "created_at": created_at,
+                "reason": rng.choice(REASONS) if rng.random() < 0.2 else None,
+                "change": change,
+                "score": topic["score"],
+            }
+        )
+
+    for batch in range(0, len(rows), 10000):
+        db_session.execute(insert(KarmaChange), rows[batch : batch + 10000])
+    if totals:
+        db_session.execute(update(Karma), list(totals.values()))
+    db_session.commit()
+
+
+def make_stream(rng: random.Random, topics: int, users: List[User], length: int):
+    """Generate (kind, content, user, author) for each message of a synthetic stream"""
+    weights = list(accumulate(1 / rank for rank in range(1, topics + 1)))
+    kinds, proportions = zip(*MESSAGE_KINDS.items())
+
+    def topic():
+        return f"topic{rng.choices(range(topics), cum_weights=weights)[0]}"
+
+    for i in range(length):
+        kind = rng.choices(kinds, proportions)[0]
+        prose = " ".join(rng.choices(WORDS, k=rng.randint(3, 20)))
+        if kind == "no karma":
+            content = prose
+        elif kind == "one topic":
+            content = f"{prose} {topic()}{rng.choice(['++', '--', '+-'])}"
+        elif kind == "one topic, reason":
+            content = f"{topic()}++ ({rng.choice(REASONS)})"
+        elif kind == "several topics":
+            several = {topic() for _ in range(rng.randint(2, 5))}
+            content = " ".join(f"{t}++" for t in several)
+        else:
+            content = f"{prose} newtopic{i}++"
+
+        user = rng.choice(users)
+        author = pretend.stub(
+            name=user.username, nick=None, id=user.user_uid, mention=f"<@{user.id}>"
+        )
+        yield kind, content, user, author
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default="sqlite://")
+    parser.add_argument("--topics", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--changes", type=int, default=200000)
+    parser.add_argument("--messages", type=int, default=5000)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database)
+    Base.metadata.create_all(engine)
+    db_session = Session(bind=engine, future=True)
+    if db_session.scalar(select(func.count()).select_from(Karma)):
+        sys.exit(f"{args.database} already has karma in it, use an empty database")
+
+    rng = random.Random(0)
+    started = time.perf_counter()
+    seed(db_session, rng, args.topics, args.users, args.changes)
+    print(
+        f"Seeded {args.topics} topics, {args.users} users and {args.changes} changes "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+    instrument_engine(engine)
+    # Detached, otherwise every commit expires thousands of users the bot wouldn't hold
+    users = db_session.scalars(select(User)).all()
+    db_session.expunge_all()
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    query_counts: Dict[str, int] = defaultdict(int)
+    stream = make_stream(rng, args.topics, users, args.messages)
+    for message_id, (kind, content, user, author) in enumerate(stream, args.changes):
+        message = make_message_stub(content, author)
+        started = time.perf_counter()
+        with track_queries(kind) as stats:
+            # No cooldown, so that every karma message writes to the database
+            process_karma(message, message_id, db_session, 0, user)
+        latencies[kind].append(time.perf_counter() - started)
+        query_counts[kind] += stats.queries
+
+    print(
+        f"{'':>18} {'messages':>8} {'msgs/sec':>9} {'p50 ms':>7} {'p99 ms':>7} "
+        f"{'queries':>7}"
+    )
+    everything = [t for times in latencies.values() for t in times]
+    rows = {kind: latencies[kind] for kind in MESSAGE_KINDS if latencies[kind]}
+    rows["all"] = everything
+    for kind, times in rows.items():
+        count = query_counts[kind] if kind != "all" else sum(query_counts.values())
+        # quantiles needs at least two points
+        cuts = statistics.quantiles(times * 2 if len(times) < 2 else times, n=100)
+        print(
+            f"{kind:>18} {len(times):>8} {len(times) / sum(times):>9.0f} "
+            f"{1000 * cuts[49]:>7.3f} {1000 * cuts[98]:>7.3f} "
+            f"{count / len(times):>7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Compare evaluating dice programs with and without tracking the trace on every node.
+
+Evaluation used to push and pop every token it reduced or hashed on a trace list, and
+log every token it constructed, so that errors could say where they happened. Now the
+trace is only rebuilt from the traceback when a rollerr exception is raised. This puts
+the old bookkeeping back temporarily to show what it cost on deep recursive programs.
+
+Run from the repository root with `python -m benchmarks.roll_trace`.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, List, Tuple
+
+from roll.ast import Environment, HashCounter, IToken, Program
+from roll.parser import parse_program
+
+REPEATS = 20
+
+PROGRAMS = {
+    "recursive sum": r"@rec = \x -> x ? 1 + (rec x-1) : 0 ; rec 60",
+    "factorial": r"@fact = \x -> x ? x*(fact x-1) : 1 ; fact 60",
+    "fibonacci loop": (
+        r"@fib = \x -> ^loop=(\a1 a2 n -> (n == 0) ? a1 : ((n == 1) ? a2 : "
+        r"loop a2 (a1 + a2) (n - 1))) $ loop 0 1 x;fib 20"
+    ),
+    "many dice": " + ".join(["(1d20 > 10 ? 2d6 : 1d4)"] * 50),
+}
+
+
+def token_classes() -> List[type]:
+    classes: List[type] = [Program]
+    pending = [IToken]
+    while pending:
+        cls = pending.pop()
+        classes.append(cls)
+        pending.extend(cls.__subclasses__())
+    return classes
+
+
+@contextmanager
+def eager_tracing(calls: List[int]):
+    """Wraps every reduce, hash_vars and constructor the way they used to be"""
+    patched: List[Tuple[type, str, Callable[..., Any]]] = []
+
+    def trace(func: Callable[..., Any]):
+        def wrapper(*args: Any, **kwargs: Any):
+            calls[0] += 1
+            args[1].trace.append(args[0])
+            out = func(*args, **kwargs)
+            args[1].trace.pop()
+            return out
+
+        return wrapper
+
+    def log(func: Callable[..., Any]):
+        def wrapper(self: Any, *args: Any, **kwargs: Any):
+            func(self, *args, **kwargs)
+            logging.debug(self.__class__.__name__, self)
+
+        return wrapper
+
+    for cls in token_classes():
+        for name, wrap in (("reduce", trace), ("hash_vars", trace), ("__init__", log)):
+            original = vars(cls).get(name)
+            if original is None or (cls is Program and name == "reduce"):
+                continue
+            patched.append((cls, name, original))
+            setattr(cls, name, wrap(original))
+    # Shared between programs, but every push is popped again
+    Environment.trace = HashCounter.trace = []
+    try:
+        yield
+    finally:
+        for cls, name, original in patched:
+            setattr(cls, name, original)
+        del Environment.trace, HashCounter.trace
+
+
+def evaluate(source: str) -> float:
+    """Parses and evaluates a program, returning the seconds spent evaluating it"""
+    program = parse_program(source)
+    started = time.perf_counter()
+    program.reduce()
+    return time.perf_counter() - started
+
+
+def time_evaluation(source: str) -> float:
+    return sum(evaluate(source) for _ in range(REPEATS)) / REPEATS
+
+
+def deepest_recursion() -> int:
+    depth = 10
+    while True:
+        try:
+            evaluate(rf"@rec = \x -> x ? 1 + (rec x-1) : 0 ; rec {depth + 10}")
+        except RecursionError:
+            return depth
+        depth += 10
+
+
+def main():
+    print(
+        f"{'':>16} {'nodes':>6} {'eager µs':>9} {'lazy µs':>8} {'eager ns/node':>14} "
+        f"{'lazy ns/node':>13}"
+    )
+    for name, source in PROGRAMS.items():
+        calls = [0]
+        with eager_tracing(calls):
+            evaluate(source)
+            nodes = calls[0]
+            eager = time_evaluation(source)
+        lazy = time_evaluation(source)
+        print(
+            f"{name:>16} {nodes:>6} {1e6 * eager:>9.0f} {1e6 * lazy:>8.0f} "
+            f"{1e9 * eager / nodes:>14.0f} {1e9 * lazy / nodes:>13.0f}"
+        )
+
+    # The wrappers' frames also count towards Python's recursion limit
+    with eager_tracing([0]):
+        eager_depth = deepest_recursion()
+    print(f"Deepest recursive sum: {eager_depth} eager, {deepest_recursion()} lazy")
+
+
+if __name__ == "__main__":
+    main()
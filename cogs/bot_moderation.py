@@ -1,9 +1,9 @@
 from datetime import datetime, timedelta, timezone
 
-import discord
 from discord import Color, Embed
 from discord.ext.commands import Bot, Cog
 
+from cogs.message_dispatch import MessageContext, message_handler
 from config import CONFIG
 
 
@@ -11,8 +11,10 @@ class BotModeration(Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
         
-    @Cog.listener()
-    async def on_message(self, message: discord.Message):
+    # Runs first so that spam is removed before anything else responds to it
+    @message_handler(order=0)
+    async def remove_spam(self, ctx: MessageContext):
+        message = ctx.message
         # compare in UTC since joined_at will be in UTC
         joined_recently = message.author.joined_at > datetime.now(timezone.utc) - timedelta(days=7)
         contains_everyone = '@everyone' in message.content
@@ -31,6 +33,7 @@ class BotModeration(Cog):
         )
         
         await message.delete()
+        ctx.stop = True
         await channel.send(f'<@&{CONFIG.UWCS_EXEC_ROLE_IDS[1]}>', embed=embed)
         await message.author.timeout(timedelta(days=1))
 
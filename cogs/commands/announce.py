@@ -7,12 +7,14 @@ from discord import AllowedMentions, Interaction, ui
 from discord.ext import commands
 from discord.ext.commands import Bot, Context, MissingPermissions
 from humanize import precisedelta
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
 from sqlalchemy_utils import ScalarListException
 
 import utils.utils
 from config import CONFIG
-from models import db_session
+from models import db_session, event_session
 from models.announcement import Announcement
 from utils import (
     DateTimeConverter,
@@ -259,36 +261,39 @@ async def announcement_check(bot):
     while not bot.is_closed():
         # Find announcements that need posting
         now = datetime.datetime.now()
-        announcements = (
-            db_session.query(Announcement)
-            .filter(Announcement.trigger_at <= now, Announcement.triggered.is_(False))
-            .all()
-        )
-
-        for a in announcements:
-            channel = bot.get_channel(a.playback_channel_id)
-            webhook = await get_webhook(channel)
-
-            # Find author info
-            name, avatar = None, None
-            if a.irc_name:
-                name = a.irc_name
-            else:
-                author = (
-                    bot.get_user(a.user.user_uid)
-                    if CONFIG.ANNOUNCEMENT_IMPERSONATE
-                    else bot.user
+        async with event_session() as session:
+            announcements = await session.scalars(
+                select(Announcement)
+                .where(
+                    Announcement.trigger_at <= now, Announcement.triggered.is_(False)
                 )
-                name, avatar = author.name, author.avatar.url
+                .options(joinedload(Announcement.user))
+            )
 
-            message = a.announcement_content
-            a.triggered = True
-            db_session.commit()
+            for a in announcements.all():
+                channel = bot.get_channel(a.playback_channel_id)
+                webhook = await get_webhook(channel)
+
+                # Find author info
+                name, avatar = None, None
+                if a.irc_name:
+                    name = a.irc_name
+                else:
+                    author = (
+                        bot.get_user(a.user.user_uid)
+                        if CONFIG.ANNOUNCEMENT_IMPERSONATE
+                        else bot.user
+                    )
+                    name, avatar = author.name, author.avatar.url
 
-            # Post message
-            await generate_announcement(
-                channel, message, webhook, name, avatar, AllowedMentions.all()
-            )
+                message = a.announcement_content
+                a.triggered = True
+                await session.commit()
+
+                # Post message
+                await generate_announcement(
+                    channel, message, webhook, name, avatar, AllowedMentions.all()
+                )
 
         await asyncio.sleep(CONFIG.ANNOUNCEMENT_SEARCH_INTERVAL)
 
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import re
 from datetime import datetime, timedelta, timezone
@@ -13,6 +14,7 @@ from discord.ext.commands import (
 )
 
 from cogs.commands.openaiadmin import is_author_banned_openai
+from cogs.message_dispatch import MessageContext, message_handler
 from config import CONFIG
 from utils.utils import get_name_and_content, split_into_messages
 
@@ -45,6 +47,8 @@ class ChatGPT(commands.Cog):
         if CONFIG.AI_INCLUDE_NAMES:
             self.system_prompt += "\nYou are in a Discord chat room, each message is prepended by the name of the message's author separated by a colon."
         self.cooldowns = {}
+        # The event loop only keeps weak references to tasks, so hold them until done
+        self.chain_tasks = set()
 
     @commands.hybrid_command(help=LONG_HELP_TEXT, brief=SHORT_HELP_TEXT)
     async def prompt(self, ctx: Context, *, message: str):
@@ -59,12 +63,26 @@ class ChatGPT(commands.Cog):
     async def chat(self, ctx: Context, *, message: str):
         await self.cmd(ctx, message)
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
+    @message_handler(order=30)
+    async def reply_to_chain(self, ctx: MessageContext):
+        message = ctx.message
         # Avoid replying to bot or msg that triggers the command anyway
         if message.author.bot or message.content.startswith(CONFIG.PREFIX):
             return
+        if message.reference is None:
+            return
+
+        # Fetching the chain and waiting on OpenAI is slow, so don't hold up the other handlers
+        task = self.bot.loop.create_task(self.continue_chain(message))
+        self.chain_tasks.add(task)
+        task.add_done_callback(self.chain_done)
+
+    def chain_done(self, task: asyncio.Task):
+        self.chain_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error("Failed to continue a reply chain", exc_info=task.exception())
 
+    async def continue_chain(self, message: discord.Message):
         # Only engage if replying to Apollo, use !chat to trigger otherwise
         previous = await self.fetch_previous(message)
         if not previous:
@@ -1,17 +1,11 @@
-import io
-import os
+import asyncio
 import shlex
-import tempfile
-from collections import defaultdict
-from contextlib import nullcontext
-from datetime import datetime, timedelta
+from datetime import datetime
 from io import BytesIO
-from pathlib import Path
 from time import time
 from typing import Dict, List, Optional, Tuple
 
-import matplotlib
-import matplotlib.pyplot as plt
+import discord
 from discord import Color, Embed, File
 from discord.ext import commands
 from discord.ext.commands import (
@@ -22,28 +16,19 @@ from discord.ext.commands import (
     MissingRequiredArgument,
     clean_content,
 )
-from matplotlib import font_manager, rc_context
-from matplotlib.dates import (
-    DateFormatter,
-    DayLocator,
-    HourLocator,
-    MinuteLocator,
-    MonthLocator,
-    WeekdayLocator,
-    YearLocator,
-    date2num,
-)
 from pytz import timezone, utc
-from sqlalchemy import func
-
-from models import db_session
+from sqlalchemy import func, select
+
+from cogs.parallelism import Parallelism, register_process_initializer
+from karma.plot import render_karma_plot, warm
+from karma.reasons import ReasonsPage, fetch_reasons_page
+from karma.stats import get_karma_stats
+from karma.timeline import get_karma_timeline
+from models import event_session
 from models.karma import Karma as KarmaModel
 from models.karma import KarmaChange
-from models.user import User
 from utils import get_name_string, pluralise
-
-matplotlib.use("Agg")
-
+from utils.cache import LRUCache
 
 LONG_HELP_TEXT = """
 Query and display the information about the karma topics on the UWCS discord server.
@@ -64,120 +49,52 @@ def current_milli_time():
     return int(round(time() * 1000))
 
 
-# Utility coroutine to generate the matplotlib Figure object that can be manipulated by the calling function
+# The label, id and last change of each topic on a plot, and whether it's xkcd style
+PlotKey = Tuple[Tuple[Tuple[str, int, Optional[datetime]], ...], bool]
+# Rendered plots, a new change to any of the topics is a cache miss
+plot_cache: LRUCache[PlotKey, bytes] = LRUCache(64)
+
+
+# Utility coroutine to render a plot of the given karma topics in a worker process
 async def plot_karma(
-    karma_dict: Dict[str, List[KarmaChange]], xkcd: bool = False
+    bot: Bot, karma_items: Dict[str, KarmaModel], xkcd: bool = False
 ) -> Tuple[Optional[BytesIO], str]:
     # Error if there's no input data
-    if len(karma_dict) == 0:
+    if len(karma_items) == 0:
         return None, ""
 
-    # Matplotlib preamble
-    plt.clf()
-    xkcd_context = plt.xkcd if xkcd else nullcontext
-    line_width = plt.rcParams["grid.linewidth"]
-
-    # Load Humor Sans font
-    font_path = str(Path("resources", "Humor-Sans.ttf"))
-    font_manager.fontManager.addfont(font_path)
-
-    # xkcd context sets grid.linewidth to 0 which causes an error with ax.grid.
-    # Setting it back to the initial line width fixes this.
-    with xkcd_context(), rc_context(
-        {"grid.linewidth": line_width, "figure.autolayout": True}
-    ):
-        fig, ax = plt.subplots(figsize=(8, 6))
-
-    # Get the earliest and latest karma values fo
-    earliest_karma = utc.localize(datetime.utcnow()).astimezone(
-        timezone("Europe/London")
+    # Topics are always drawn in the same order, so any order of arguments hits the cache
+    labels = sorted(karma_items)
+    key = (
+        tuple(
+            (label, karma_items[label].id, karma_items[label].last_changed_at)
+            for label in labels
+        ),
+        xkcd,
     )
-    latest_karma = utc.localize(datetime(1970, 1, 1)).astimezone(
-        timezone("Europe/London")
-    )
-    for key, changes in karma_dict.items():
-        earliest_karma = (
-            changes[0].local_time
-            if changes[0].local_time < earliest_karma
-            else earliest_karma
-        )
-        latest_karma = (
-            changes[-1].local_time
-            if changes[-1].local_time >= latest_karma
-            else latest_karma
-        )
-
-    karma_timeline = latest_karma - earliest_karma
-
-    # Determine the right graph tick positioning
-    if karma_timeline <= timedelta(hours=1):
-        date_format = DateFormatter("%H:%M %d %b %Y")
-        date_locator_major = MinuteLocator(interval=15)
-        date_locator_minor = MinuteLocator()
-    elif karma_timeline <= timedelta(hours=6):
-        date_format = DateFormatter("%H:%M %d %b %Y")
-        date_locator_major = HourLocator()
-        date_locator_minor = MinuteLocator(interval=15)
-    elif karma_timeline <= timedelta(days=14):
-        date_format = DateFormatter("%d %b %Y")
-        date_locator_major = DayLocator()
-        date_locator_minor = HourLocator(interval=6)
-    elif karma_timeline <= timedelta(days=30):
-        date_format = DateFormatter("%d %b %Y")
-        date_locator_major = WeekdayLocator()
-        date_locator_minor = DayLocator()
-    elif karma_timeline <= timedelta(days=365):
-        date_format = DateFormatter("%B %Y")
-        date_locator_major = MonthLocator()
-        date_locator_minor = WeekdayLocator(interval=2)
-    else:
-        date_format = DateFormatter("%Y")
-        date_locator_major = YearLocator()
-        date_locator_minor = MonthLocator()
-
-    # Transform the karma changes into plottable values
-    for karma, changes in karma_dict.items():
-        scores = [k.score for k in changes]
-        time = date2num([k.local_time for k in changes])
-
-        # Plot the values
-        ax.xaxis.set_major_locator(date_locator_major)
-        ax.xaxis.set_minor_locator(date_locator_minor)
-        ax.xaxis.set_major_formatter(date_format)
-        ax.grid(visible=True, which="minor", color="0.9", linestyle=":")
-        ax.grid(visible=True, which="major", color="0.5", linestyle="--")
-        ax.set(
-            xlabel="Time",
-            ylabel="Karma",
-            xlim=[
-                time[0] - ((time[-1] - time[0]) * 0.05),
-                time[-1] + ((time[-1] - time[0]) * 0.05),
-            ],
+    png = plot_cache.get(key)
+    if png is None:
+        async with event_session() as session:
+            timelines = await session.run_sync(
+                lambda s: {
+                    label: get_karma_timeline(karma_items[label], s) for label in labels
+                }
+            )
+        p = await Parallelism.get(bot)
+        png = await asyncio.wrap_future(
+            p.execute_on_process(render_karma_plot, timelines, xkcd)
         )
-        (line,) = ax.plot_date(time, scores, "-", xdate=True)
-        line.set_label(karma)
+        plot_cache.put(key, png)
 
-    # Create a legend if more than  1 line and format the dates
-    if len(karma_dict.keys()) > 1:
-        with xkcd_context():
-            ax.legend()
-    fig.autofmt_xdate()
-
-    # Save the file to disk and set the right permissions
     filename = (
-        "".join(karma_dict.keys())
+        "".join(karma_items.keys())
         + "-"
         + str(hex(int(datetime.utcnow().timestamp()))).lstrip("0x")
         + ".png"
     ).replace(" ", "")
     # path = CONFIG.FIG_SAVE_PATH / filename
 
-    img = io.BytesIO()
-    with xkcd_context():
-        fig.savefig(img, dpi=240, transparent=False, format="png")
-    img.seek(0)
-    plt.close(fig)
-    return img, filename
+    return BytesIO(png), filename
 
 
 # Util function to construct comma-separated strings in the form of:
@@ -210,9 +127,79 @@ def convert_int(argument: str):
         return int(argument, base=10)
 
 
+# Reasons are cut short so that a full page always fits in a Discord message
+MAX_REASON_LENGTH = 150
+
+
+def reason_prefix(change: int) -> str:
+    # These are full width unicode characters to ensure that the text remains
+    # aligned when not in a monospace font
+    if change > 0:
+        return "＋"
+    elif change < 0:
+        return "－"
+    else:
+        return "＝"
+
+
+def shorten(reason: str) -> str:
+    if len(reason) <= MAX_REASON_LENGTH:
+        return reason
+    return reason[: MAX_REASON_LENGTH - 1] + "…"
+
+
+class ReasonsView(discord.ui.View):
+    """Pages through a topic's reasons, fetching each page as it's asked for"""
+
+    def __init__(self, karma_id: int, name: str, page: ReasonsPage):
+        super().__init__(timeout=300)
+        self.karma_id = karma_id
+        self.name = name
+        self.show(page)
+
+    def show(self, page: ReasonsPage):
+        self.page = page
+        self.previous.disabled = not page.has_previous
+        self.next.disabled = not page.has_next
+
+    def render(self) -> str:
+        bullet_points = "\n".join(
+            f" {reason_prefix(change)} {shorten(reason)}"
+            for reason, change in self.page.reasons
+        )
+        return f'The reasons for "{self.name}" are as follows:\n\n{bullet_points}'
+
+    async def turn(self, interaction: discord.Interaction, page: ReasonsPage):
+        # Another page could have been karma'd away in the meantime, stay put if so
+        if page.reasons:
+            self.show(page)
+        await interaction.response.edit_message(content=self.render(), view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.primary)
+    async def previous(
+        self, interaction: discord.Interaction, button: discord.ui.Button
+    ):
+        """shows the page of older reasons"""
+        async with event_session() as session:
+            page = await session.run_sync(
+                lambda s: fetch_reasons_page(self.karma_id, s, before=self.page.first)
+            )
+        await self.turn(interaction, page)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.primary)
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """shows the page of newer reasons"""
+        async with event_session() as session:
+            page = await session.run_sync(
+                lambda s: fetch_reasons_page(self.karma_id, s, after=self.page.last)
+            )
+        await self.turn(interaction, page)
+
+
 class Karma(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        register_process_initializer(warm)
 
     @commands.hybrid_group(help=LONG_HELP_TEXT, brief=SHORT_HELP_TEXT)
     async def karma(self, ctx: Context):
@@ -222,23 +209,19 @@ class Karma(commands.Cog):
     @karma.command(help="Shows the top 5 karma topics")
     async def top(self, ctx: Context):
         # Get the top 5 karma items
-        top_karma = (
-            db_session.query(KarmaModel)
-            .order_by(KarmaModel.net_score.desc(), KarmaModel.name.asc())
-            .limit(5)
-            .all()
-        )
+        async with event_session() as session:
+            top_karma = (
+                await session.scalars(
+                    select(KarmaModel)
+                    .order_by(KarmaModel.score.desc(), KarmaModel.name.asc())
+                    .limit(5)
+                )
+            ).all()
 
         # Construct the appropriate response string
         result = f"The top {len(top_karma)} items and their scores are:\n\n"
         for karma in top_karma:
-            latest_karma = (
-                db_session.query(KarmaChange)
-                .filter(KarmaChange.karma_id == karma.id)
-                .order_by(KarmaChange.created_at.desc())
-                .first()
-            )
-            result += f" • **{karma.name}** with a score of {latest_karma.score}\n"
+            result += f" • **{karma.name}** with a score of {karma.score}\n"
         result += "\nWhere equal scores, karma is sorted alphabetically. :scales:"
 
         await ctx.send(result)
@@ -246,23 +229,19 @@ class Karma(commands.Cog):
     @karma.command(help="Shows the bottom 5 karma topics")
     async def bottom(self, ctx: Context):
         # Get the bottom 5 karma items
-        top_karma = (
-            db_session.query(KarmaModel)
-            .order_by(KarmaModel.net_score.asc(), KarmaModel.name.asc())
-            .limit(5)
-            .all()
-        )
+        async with event_session() as session:
+            top_karma = (
+                await session.scalars(
+                    select(KarmaModel)
+                    .order_by(KarmaModel.score.asc(), KarmaModel.name.asc())
+                    .limit(5)
+                )
+            ).all()
 
         # Construct the appropriate response string
         result = f"The bottom {len(top_karma)} items and their scores are:\n\n"
         for karma in top_karma:
-            latest_karma = (
-                db_session.query(KarmaChange)
-                .filter(KarmaChange.karma_id == karma.id)
-                .order_by(KarmaChange.created_at.desc())
-                .first()
-            )
-            result += f" • **{karma.name}** with a score of {latest_karma.score}\n"
+            result += f" • **{karma.name}** with a score of {karma.score}\n"
         result += "\nWhere equal scores, karma is sorted alphabetically. :scales:"
 
         await ctx.send(result)
@@ -270,12 +249,14 @@ class Karma(commands.Cog):
     @karma.command(help="Shows the top !5 most karma'd topics")
     async def most(self, ctx: Context):
         # Get the 5 most karma'd items
-        most_karma = (
-            db_session.query(KarmaModel)
-            .order_by(KarmaModel.total_karma.desc(), KarmaModel.name.asc())
-            .limit(5)
-            .all()
-        )
+        async with event_session() as session:
+            most_karma = (
+                await session.scalars(
+                    select(KarmaModel)
+                    .order_by(KarmaModel.total_karma.desc(), KarmaModel.name.asc())
+                    .limit(5)
+                )
+            ).all()
 
         # Construct the response string
         result = "The 5 most karma'd topics and their total karma are:\n\n"
@@ -288,20 +269,20 @@ class Karma(commands.Cog):
     @karma.command(help="Gives the karma of an item", ignore_extra=True)
     async def score(self, ctx: Context, item: str):
         item = await clean_content().convert(ctx, item)
-        karma_item = self.get_karma_item(item)
+        karma_item = await self.get_karma_item(item)
         if not karma_item:
             return await ctx.reply(f"\"{item}\" hasn't been karma'd yet. :cry:")
 
         await ctx.reply(f'"{item}" has a score of {karma_item.net_score}.')
 
-    def get_karma_item(self, item: str):
+    async def get_karma_item(self, item: str) -> Optional[KarmaModel]:
         karma_stripped = item.lstrip("@")
-        karma_item = (
-            db_session.query(KarmaModel)
-            .filter(func.lower(KarmaModel.name) == func.lower(karma_stripped))
-            .first()
-        )
-        return karma_item
+        async with event_session() as session:
+            return await session.scalar(
+                select(KarmaModel)
+                .where(func.lower(KarmaModel.name) == func.lower(karma_stripped))
+                .limit(1)
+            )
 
     @karma.command(
         help="Gives information about the specified karma topic", ignore_extra=True
@@ -313,7 +294,7 @@ class Karma(commands.Cog):
 
         t_start = current_milli_time()
         karma_stripped = item.lstrip("@")
-        karma_item = self.get_karma_item(item)
+        karma_item = await self.get_karma_item(item)
 
         # If the item doesn't exist then raise an error
         if not karma_item:
@@ -322,37 +303,24 @@ class Karma(commands.Cog):
             )
 
         # Get the changes and plot the graph
-        img, filename = await plot_karma({karma_stripped: karma_item.changes})
-
-        # Get the user with the most karma
-        # I'd use a group_by sql statement here, but it seems to not terminate
-        all_changes = (
-            db_session.query(KarmaChange)
-            .filter(KarmaChange.karma_id == karma_item.id)
-            .order_by(KarmaChange.created_at.asc())
-            .all()
+        img, filename = await plot_karma(
+            self.bot, {karma_stripped: karma_item}
         )
 
-        # User is not a hashable type (?) due to dataclass fuckery (???)
-        user_changes: defaultdict[int, list[KarmaChange]] = defaultdict(list)
-        for change in all_changes:
-            user_changes[change.user.id].append(change)
-
-        most_karma = max(user_changes.items(), key=lambda item: len(item[1]))
-        most_karma = (
-            db_session.query(User).filter(User.id == most_karma[0]).one_or_none(),
-            most_karma[1],
-        )
-        assert most_karma[0]
+        async with event_session() as session:
+            stats = await session.run_sync(lambda s: get_karma_stats(karma_item, s))
 
         # Calculate the approval rating of the karma
         approval = 100 * (
             (karma_item.pluses - karma_item.minuses)
             / (karma_item.pluses + karma_item.minuses)
         )
-        mins_per_karma = (
-            all_changes[-1].local_time - all_changes[0].local_time
-        ).total_seconds() / (60 * len(all_changes))
+        mins_per_karma = (stats.last_change - stats.first_change).total_seconds() / (
+            60 * stats.changes
+        )
+        first_change = utc.localize(stats.first_change).astimezone(
+            timezone("Europe/London")
+        )
         time_taken = (current_milli_time() - t_start) / 1000
 
         # Construct the embed
@@ -362,14 +330,14 @@ class Karma(commands.Cog):
         )
         embed_colour = Color.from_rgb(61, 83, 255)
         embed_title = f'Statistics for "{karma_stripped}"'
-        embed_description = f'"{karma_stripped}" has a karma of {karma_item.net_score} and has been karma\'d {len(all_changes)} {pluralise(all_changes, "time")} by {len(user_changes.keys())} {pluralise(user_changes.keys(), "user")}.'
+        embed_description = f'"{karma_stripped}" has a karma of {karma_item.net_score} and has been karma\'d {stats.changes} {pluralise(stats.changes, "time")} by {stats.users} {pluralise(stats.users, "user")}.'
 
         embed = Embed(
             title=embed_title, description=embed_description, color=embed_colour
         )
         embed.add_field(
             name="Most karma'd",
-            value=f'"{karma_stripped}" has been karma\'d the most by <@{most_karma[0].user_uid}> with a total of {len(most_karma[1])} {pluralise(most_karma[1], "change")}.',
+            value=f'"{karma_stripped}" has been karma\'d the most by <@{stats.top_user_uid}> with a total of {stats.top_user_changes} {pluralise(stats.top_user_changes, "change")}.',
         )
         embed.add_field(
             name="Approval rating",
@@ -377,7 +345,7 @@ class Karma(commands.Cog):
         )
         embed.add_field(
             name="Karma timeline",
-            value=f'"{karma_stripped}" was first karma\'d on {datetime.strftime(all_changes[0].local_time, "%d %b %Y at %H:%M")} and has been karma\'d approximately every {mins_per_karma:.1f} minutes.',
+            value=f'"{karma_stripped}" was first karma\'d on {datetime.strftime(first_change, "%d %b %Y at %H:%M")} and has been karma\'d approximately every {mins_per_karma:.1f} minutes.',
         )
         embed.set_footer(
             text=f"Statistics generated at {generated_at} in {time_taken:.3f} seconds."
@@ -414,16 +382,13 @@ class Karma(commands.Cog):
             raise KarmaError(message="I can't")
 
         karma_dict = dict()
+        total_changes = 0
         failed = []
 
         # Iterate over the karma item(s)
         for karma in args:
             karma_stripped = karma.lstrip("@")
-            karma_item = (
-                db_session.query(KarmaModel)
-                .filter(func.lower(KarmaModel.name) == func.lower(karma_stripped))
-                .first()
-            )
+            karma_item = await self.get_karma_item(karma_stripped)
 
             # Bucket the karma item(s) based on existence in the database
             if not karma_item:
@@ -431,17 +396,24 @@ class Karma(commands.Cog):
                 continue
 
             # Check if the topic has been karma'd >=10 times
-            if len(karma_item.changes) < 5:
+            async with event_session() as session:
+                changes = await session.scalar(
+                    select(func.count())
+                    .select_from(KarmaChange)
+                    .where(KarmaChange.karma_id == karma_item.id)
+                )
+            if changes < 5:
                 failed.append(
                     (
                         karma_stripped,
-                        f"must have been karma'd at least 5 times before a plot can be made (currently karma'd {len(karma_item.changes)} {pluralise(karma_item.changes, 'time')})",
+                        f"must have been karma'd at least 5 times before a plot can be made (currently karma'd {changes} {pluralise(changes, 'time')})",
                     )
                 )
                 continue
 
-            # Add the karma changes to the dict
-            karma_dict[karma_stripped] = karma_item.changes
+            # Add the karma item to the dict
+            karma_dict[karma_stripped] = karma_item
+            total_changes += changes
 
         if len(karma_dict) == 0:
             if failed:
@@ -453,7 +425,7 @@ class Karma(commands.Cog):
                 return await ctx.send("No items to graph!")
 
         # Plot the graph and save it to a png
-        img, filename = await plot_karma(karma_dict, xkcd)
+        img, filename = await plot_karma(self.bot, karma_dict, xkcd)
         t_end = current_milli_time()
 
         # Construct the embed
@@ -462,7 +434,6 @@ class Karma(commands.Cog):
             "%H:%M %d %b %Y",
         )
         time_taken = (t_end - t_start) / 1000
-        total_changes = sum(len(v) for v in karma_dict.values())
         # Construct the embed strings
         if keys := karma_dict.keys():
             embed_colour = Color.from_rgb(61, 83, 255)
@@ -492,9 +463,10 @@ class Karma(commands.Cog):
             )
             embed.set_image(url=f"attachment://{filename}")
 
+        # Scores start at zero, so the current scores add up to the net change
         emoji = (
             ":chart_with_upwards_trend:"
-            if sum(c.change for cs in karma_dict.values() for c in cs) >= 0
+            if sum(k.score for k in karma_dict.values()) >= 0
             else ":chart_with_downwards_trend:"
         )
         file = File(img, filename=filename)
@@ -526,75 +498,24 @@ class Karma(commands.Cog):
         karma_stripped = karma.lstrip("@")
 
         # Get the karma from the database
-        karma_item = (
-            db_session.query(KarmaModel)
-            .filter(func.lower(KarmaModel.name) == func.lower(karma_stripped))
-            .first()
-        )
+        karma_item = await self.get_karma_item(karma_stripped)
 
         if karma_item:
             # Set the karma item's name to be the same as in the database
             karma_stripped = karma_item.name
-            # Local function for getting prefix of karma reason
-            # These are full width unicode characters to ensure that the text remains
-            # aligned when not in a monospace font
-
-            def prefix(change: KarmaChange):
-                if change.change > 0:
-                    return "＋"
-                elif change.change < 0:
-                    return "－"
-                else:
-                    return "＝"
-
-            # Get all the changes that have some reason
-            karma_changes = (
-                db_session.query(KarmaChange)
-                .filter(
-                    KarmaChange.karma_id == karma_item.id,
-                    KarmaChange.reason is not None,
+            async with event_session() as session:
+                page = await session.run_sync(
+                    lambda s: fetch_reasons_page(karma_item.id, s)
                 )
-                .all()
-            )
-            # Flatten the reasons into a single list and sort it alphabetically
-            reasons = sorted(
-                (
-                    (r, p)
-                    for (r, p) in (
-                        (change.reason, prefix(change)) for change in karma_changes
-                    )
-                    if r is not None
-                ),
-                key=lambda t: t[0].casefold(),
-            )
 
             # If there's at least one reason
-            if reasons:
-                reasons_plural = pluralise(reasons, "reason")
-
-                bullet_points = "\n".join(
-                    f" {prefix} {reason}" for (reason, prefix) in reasons
-                )
-                result = f'The {reasons_plural} for "{karma_stripped}" are as follows:\n\n{bullet_points}'
+            if page.reasons:
+                view = ReasonsView(karma_item.id, karma_stripped, page)
+                await ctx.send(view.render(), view=view)
             else:
-                result = "There are no reasons down for that karma topic! :frowning:"
-
-            file = None
-            fp = None
-            if len(result) > 2000:
-                # Create a new temporary file that isn't deleted until we say
-                with tempfile.NamedTemporaryFile(delete=False) as fp:
-                    fp.write(result.encode("utf8"))
-
-                # Wait for the file to close before accessing it (Windows NT limitation)
-                file = File(fp.name, filename=f"{karma_stripped}.txt")
-                result = f'There are too many reasons for "{karma_stripped}" to fit in a Discord message!'
-
-            await ctx.send(result, file=file)
-
-            # Delete temporary file (if any) after message is sent
-            if fp:
-                os.remove(fp.name)
+                await ctx.send(
+                    "There are no reasons down for that karma topic! :frowning:"
+                )
         else:
             # The item hasn't been karma'd
             result = f"\"{karma_stripped}\" hasn't been karma'd yet. :cry:"
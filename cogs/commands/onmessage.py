@@ -1,35 +1,27 @@
-from re import search, sub
-
 from discord import Message
-from discord.abc import GuildChannel
 from discord.ext import commands
-from discord.ext.commands import Bot, Cog
+from discord.ext.commands import Bot
+
+from cogs.message_dispatch import MessageContext, message_handler
+from utils.message_classification import LINK_REWRITES
 
 
 class OnMessage(commands.Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
 
-    @Cog.listener()
-    async def on_message(self, message: Message):
-        if isinstance(message.channel, GuildChannel):
-            # Get all specified command prefixes for the bot
-            command_prefixes = self.bot.command_prefix(self.bot, message)
-            if not any(
-                message.content.startswith(prefix) for prefix in command_prefixes
-            ):
-                await self.thanks(message)
-                await self.scan_replace(
-                    message, r"https?://(twitter\.com|x\.com)", "https://fxtwitter.com"
-                )
-                await self.scan_replace(
-                    message,
-                    r"https?://(?:old\.|www\.)?reddit\.com",
-                    "https://rxddit.com",
-                )
-                await self.scan_replace(
-                    message, r"https?://www\.instagram\.com", "https://uuinstagram.com"
-                )
+    @message_handler(order=20)
+    async def react_and_rewrite(self, ctx: MessageContext):
+        message = ctx.message
+        if ctx.in_guild:
+            classification = ctx.classification
+            if not classification.is_command:
+                # only heart if thanks matches word in message
+                if classification.has_thanks:
+                    await self.thanks(message)
+                if classification.has_rewritable_link:
+                    for regex, replace in LINK_REWRITES:
+                        await self.scan_replace(message, regex, replace)
 
     async def thanks(self, message: Message):
         # to whoever sees this, you're welcome for the not having a fuck off massive indented if
@@ -54,12 +46,6 @@ class OnMessage(commands.Cog):
             # can only thank replies to bot
         else:
             return
-        thanks = ["thx", "thanks", "thank you", "ty"]
-        # only heart if thanks matches word in message
-        if not any(
-            search(r"\b" + thank + r"\b", message.content.lower()) for thank in thanks
-        ):
-            return
 
         return await message.add_reaction("💜")
 
@@ -68,8 +54,8 @@ class OnMessage(commands.Cog):
         sentance = message.content.replace("\n", " ").split(" ")
         for word in sentance:
             # if any word contains a link replace with replace
-            if search(regex, word):
-                send_message += "\n" + sub(regex, replace, word)
+            if regex.search(word):
+                send_message += "\n" + regex.sub(replace, word)
         # if there is a message to send, send it
         if send_message != "":
             await message.edit(suppress=True)
@@ -8,12 +8,14 @@ from discord.ext import commands
 from discord.ext.commands import Bot, Context
 from humanize import precisedelta
 from pytz import timezone
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
 from sqlalchemy_utils import ScalarListException
 
 import utils.utils
 from config import CONFIG
-from models import db_session
+from models import db_session, event_session
 from models.reminder import Reminder
 from utils import get_database_user, get_name_string, parse_time, user_is_irc_bot
 
@@ -27,29 +29,30 @@ async def reminder_check(bot: Bot):
     await bot.wait_until_ready()
     while not bot.is_closed():
         now = datetime.now()
-        reminders = (
-            db_session.query(Reminder)
-            .filter(Reminder.trigger_at <= now, Reminder.triggered == False)  # noqa 712
-            .all()
-        )
-        for r in reminders:
-            if r.irc_name:
-                display_name = r.irc_name
-            else:
-                author_uid = r.user.user_uid
-                display_name = f"<@{author_uid}>"
-            channel = bot.get_channel(r.playback_channel_id)
-            message = f"Reminding {display_name}: " + r.reminder_content
-            if not channel:
-                # logging.warning(f"No channel matches: {r}")
-                continue
-            try:
-                await channel.send(message)
-            except discord.DiscordException:
-                # logging.warning(f"No channel access: {r}")
-                pass
-            r.triggered = True
-        db_session.commit()
+        async with event_session() as session:
+            reminders = await session.scalars(
+                select(Reminder)
+                .where(Reminder.trigger_at <= now, Reminder.triggered.is_(False))
+                .options(joinedload(Reminder.user))
+            )
+            for r in reminders:
+                if r.irc_name:
+                    display_name = r.irc_name
+                else:
+                    author_uid = r.user.user_uid
+                    display_name = f"<@{author_uid}>"
+                channel = bot.get_channel(r.playback_channel_id)
+                message = f"Reminding {display_name}: " + r.reminder_content
+                if not channel:
+                    # logging.warning(f"No channel matches: {r}")
+                    continue
+                try:
+                    await channel.send(message)
+                except discord.DiscordException:
+                    # logging.warning(f"No channel access: {r}")
+                    pass
+                r.triggered = True
+            await session.commit()
 
         await asyncio.sleep(CONFIG.REMINDER_SEARCH_INTERVAL)
 
@@ -1,18 +1,22 @@
 import asyncio
 import logging
+from io import BytesIO
+from typing import Optional, Tuple
 
 import discord
-from discord import app_commands
+from discord import File, app_commands
 from discord.ext import commands
-from discord.ext.commands import Bot, Context, clean_content
+from discord.ext.commands import Bot, Context, check, clean_content
 from parsita import ParseError
 
 import roll.exceptions as rollerr
-from cogs.parallelism import Parallelism
-from roll.ast import MAX_ROLLS
-from roll.parser import parse_program
-from utils import get_name_string
+from config import CONFIG
+from roll.distribution import program_distribution
+from roll.parser import parse_program_cached
+from roll.stats import Summary, render_histogram, sample_program
+from utils import get_name_string, is_compsoc_exec_in_guild
 from utils.exceptions import OutputTooLargeError
+from utils.worker_pool import WorkerPool
 
 LONG_HELP_TEXT = """
 Rolls an unbiased xdy (x dice with y sides).
@@ -28,6 +32,10 @@ Supports basic arithmetic:
     !r (1d6)d(1d6)      | supports nested rolls
 
 Note: using division returns a floating point value.
+
+Statistics:
+    !r stats 4d6        | the mean, variance and a histogram of many 4d6 rolls
+    !r dist 4d6         | the exact odds of each 4d6 total (dice and arithmetic only)
 """
 
 SHORT_HELP_TEXT = """Rolls an unbiased xdy (x dice with y sides)"""
@@ -62,44 +70,99 @@ TIMEOUT_OUT = """
 """
 
 DICE_TIMEOUT = 3.0  # seconds
+MAX_OUTPUT_LENGTH = 1000
+# Exact distributions with at most this many outcomes list the odds of each
+MAX_LISTED_OUTCOMES = 12
 
 
 class Roll(commands.Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
+        # Dice get their own workers, which are killed if they run out of time
+        self.pool = WorkerPool(CONFIG.DICE_WORKERS)
+
+    async def cog_load(self):
+        # Started up front, so that the first rolls don't wait for workers to fork
+        self.pool.start()
+
+    async def cog_unload(self):
+        self.pool.shutdown()
 
-    @commands.command(
-        help=LONG_HELP_TEXT, brief=SHORT_HELP_TEXT, aliases=["r"], rest_is_raw=True
+    async def evaluate(self, message: str, display_name: str) -> str:
+        try:
+            return await self.pool.run(DICE_TIMEOUT, run, message, display_name)
+        except asyncio.TimeoutError:
+            return TIMEOUT_OUT.format(
+                ping=display_name, error=f"Ran out of time ({DICE_TIMEOUT}s)!"
+            )
+
+    @commands.group(
+        help=LONG_HELP_TEXT,
+        brief=SHORT_HELP_TEXT,
+        aliases=["r"],
+        rest_is_raw=True,
+        invoke_without_command=True,
     )
     async def roll(self, ctx: Context, *, message: clean_content):
         display_name = get_name_string(ctx.message)
-        p = await Parallelism.get(self.bot)
-        future = asyncio.wrap_future(p.execute_on_process(run, message, display_name))
+        await ctx.reply(await self.evaluate(message, display_name))
 
+    async def reply_with_plot(self, ctx: Context, runner, message: str):
+        display_name = get_name_string(ctx.message)
         try:
-            result = await asyncio.wait_for(future, DICE_TIMEOUT)
+            out, png = await self.pool.run(DICE_TIMEOUT, runner, message, display_name)
         except asyncio.TimeoutError:
-            result = TIMEOUT_OUT.format(
-                ping=display_name, error=f"Ran out of time ({DICE_TIMEOUT}s)!"
+            out, png = (
+                TIMEOUT_OUT.format(
+                    ping=display_name, error=f"Ran out of time ({DICE_TIMEOUT}s)!"
+                ),
+                None,
             )
+        if png is None:
+            await ctx.reply(out)
+        else:
+            await ctx.reply(out, file=File(BytesIO(png), filename="dice.png"))
+
+    @roll.command(rest_is_raw=True)
+    async def stats(self, ctx: Context, *, message: clean_content):
+        """Roll an expression many times and show the distribution of its results"""
+        await self.reply_with_plot(ctx, run_stats, message)
 
-        await ctx.reply(result)
+    @roll.command(rest_is_raw=True)
+    async def dist(self, ctx: Context, *, message: clean_content):
+        """Show the exact odds of each result of an expression"""
+        await self.reply_with_plot(ctx, run_dist, message)
 
     @app_commands.command(name="roll", description=SHORT_HELP_TEXT)
     async def roll_slash(self, int: discord.Interaction, dice: str):
-        p = await Parallelism.get(self.bot)
-        future = asyncio.wrap_future(
-            p.execute_on_process(run, dice, int.user.display_name)
+        result = await self.evaluate(dice, int.user.display_name)
+        await int.response.send_message(result)
+
+    @commands.command()
+    @check(is_compsoc_exec_in_guild)
+    async def dice_pool(self, ctx: Context):
+        """Show how busy the dice workers are"""
+        await ctx.reply(
+            f"{self.pool.size} dice workers, {self.pool.queue_depth} rolls waiting, "
+            f"{self.pool.kills} workers killed"
         )
 
-        try:
-            result = await asyncio.wait_for(future, DICE_TIMEOUT)
-        except asyncio.TimeoutError:
-            result = TIMEOUT_OUT.format(
-                ping=int.user.display_name, error=f"Ran out of time ({DICE_TIMEOUT}s)!"
-            )
 
-        await int.response.send_message(result)
+def error_out(e, display_name):
+    if isinstance(e, rollerr.WarningError):
+        return WARNING_OUT.format(
+            ping=display_name, error=e.__class__.__name__, body=f"_{e.out}_"
+        )
+    if isinstance(e, (ParseError, rollerr.RunTimeError)):
+        return FAILURE_OUT.format(
+            ping=display_name, error=e.__class__.__name__, body=f"```{e}```"
+        )
+    logging.exception(e)
+    return INTERNAL_OUT.format(
+        ping=display_name,
+        error=e.__class__.__name__,
+        body=f"**Internal error:**```{e}```",
+    )
 
 
 def run(message, display_name):
@@ -108,7 +171,7 @@ def run(message, display_name):
         if len(message) == 0:
             message = "1d6"
         logging.debug("==== Parsing ====")
-        program = parse_program(message)
+        program = parse_program_cached(message)
         logging.debug("==== Evaluation ====")
         logging.debug(program)
         values = program.reduce()
@@ -123,30 +186,56 @@ def run(message, display_name):
                 + [f"**{p0}** ⟵ `{p1}`" for p0, p1 in pairs_expressions]
             ),
         )
-        if len(out) > MAX_ROLLS:
+        if len(out) > MAX_OUTPUT_LENGTH:
             raise OutputTooLargeError
-    except rollerr.WarningError as e:
-        out = WARNING_OUT.format(
-            ping=display_name, error=e.__class__.__name__, body=f"_{e.out}_"
-        )
-    except ParseError as e:
-        out = FAILURE_OUT.format(
-            ping=display_name, error=e.__class__.__name__, body=f"```{e}```"
-        )
-    except rollerr.RunTimeError as e:
-        out = FAILURE_OUT.format(
-            ping=display_name, error=e.__class__.__name__, body=f"```{e}```"
-        )
     except (rollerr.InternalError, Exception) as e:
-        out = INTERNAL_OUT.format(
-            ping=display_name,
-            error=e.__class__.__name__,
-            body=f"**Internal error:**```{e}```",
-        )
-        logging.exception(e)
+        out = error_out(e, display_name)
     logging.debug("")
     return out
 
 
+def run_stats(message, display_name) -> Tuple[str, Optional[bytes]]:
+    """Sample an expression, returning a summary of the results and their histogram"""
+    try:
+        program = parse_program_cached(message.strip() or "1d6")
+        values = sample_program(program)
+        summary = Summary.of(values)
+        out = SUCCESS_OUT.format(
+            ping=display_name,
+            body=(
+                f"`{program}` over {summary.samples:,} rolls\n"
+                f"Mean **{summary.mean:.3f}**, variance **{summary.variance:.3f}**, "
+                f"from {summary.minimum:g} to {summary.maximum:g}"
+            ),
+        )
+        if len(out) > MAX_OUTPUT_LENGTH:
+            raise OutputTooLargeError
+        return out, render_histogram(values, str(program))
+    except (rollerr.InternalError, Exception) as e:
+        return error_out(e, display_name), None
+
+
+def run_dist(message, display_name) -> Tuple[str, Optional[bytes]]:
+    """Work out an expression's exact distribution, returning its odds and their plot"""
+    try:
+        program = parse_program_cached(message.strip() or "1d6")
+        dist = program_distribution(program)
+        lines = [
+            f"`{program}` has {len(dist.outcomes):,} outcomes",
+            f"Mean **{dist.mean:.3f}**, variance **{dist.variance:.3f}**",
+        ]
+        if len(dist.outcomes) <= MAX_LISTED_OUTCOMES:
+            lines += [
+                f"**{outcome:g}**: {100 * probability:.2f}%"
+                for outcome, probability in zip(dist.outcomes, dist.probabilities)
+            ]
+        out = SUCCESS_OUT.format(ping=display_name, body="\n".join(lines))
+        if len(out) > MAX_OUTPUT_LENGTH:
+            raise OutputTooLargeError
+        return out, render_histogram(dist.outcomes, str(program), dist.probabilities)
+    except (rollerr.InternalError, Exception) as e:
+        return error_out(e, display_name), None
+
+
 async def setup(bot: Bot):
     await bot.add_cog(Roll(bot))
@@ -14,7 +14,8 @@ from sqlalchemy import desc, select
 from sqlalchemy.exc import SQLAlchemyError
 
 from config import CONFIG
-from models.models import db_session
+from models.models import db_session, engine, get_async_engine
+from models.pool import pool_stats
 from models.system import EventKind, SystemEvent
 from utils import is_compsoc_exec_in_guild
 
@@ -75,6 +76,10 @@ Started {started.strftime("%d/%m/%y, %H:%M:%S")} (uptime {uptime})"""
 Could not get build information
 Python {py_version}, discord.py {dpy_version} 
 Started {started} (uptime {uptime})"""
+
+        reply += f"""\n
+Database pool: {pool_stats(engine)}
+Async database pool: {pool_stats(get_async_engine().sync_engine)}"""
         await ctx.reply(reply)
 
     @commands.hybrid_command()
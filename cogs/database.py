@@ -1,74 +1,67 @@
-import logging
-from re import search
-
 from discord import Message
-from discord.abc import GuildChannel
 from discord.ext.commands import Bot, Cog, Context
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy_utils import ScalarListException
+from sqlalchemy.orm import Session
 
+from cogs.message_dispatch import MessageContext, message_handler
 from config import CONFIG
 from karma.karma import process_karma
-from models import db_session
-from models.channel_settings import IgnoredChannel
+from models import db_session, event_session
 from models.user import User
-from utils import get_database_user, is_compsoc_exec_in_guild, user_is_irc_bot
+from utils import add_database_user, get_database_user_id, is_compsoc_exec_in_guild
+from utils.channel_settings import channel_settings
 
 
 async def not_in_blacklisted_channel(ctx: Context):
-    return (
-        await is_compsoc_exec_in_guild(ctx)
-        or db_session.query(IgnoredChannel)
-        .filter(IgnoredChannel.channel == ctx.channel.id)
-        .first()
-        is None
+    return await is_compsoc_exec_in_guild(ctx) or not channel_settings.is_ignored(
+        ctx.channel.id, db_session
     )
 
 
+def track_user_and_karma(message: Message, wants_karma: bool, session: Session) -> str:
+    """Add the author if they're new then process any karma, returning the reply
+
+    Everything goes through the one session, so the karma path only uses one pool.
+    """
+    user_id = get_database_user_id(message.author.id, session)
+    # Known users are left alone, so only a first message needs a commit
+    if user_id is None:
+        user_id = add_database_user(message.author, session)
+        if user_id is None:
+            # Something very wrong, but not way to reliably recover so abort
+            return ""
+
+    if not wants_karma:
+        return ""
+    user = session.get(User, user_id)
+    return process_karma(message, message.id, session, CONFIG.KARMA_TIMEOUT, user)
+
+
 class Database(Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
         # Set up a global check that we're not in a blacklisted channel
         self.bot.add_check(not_in_blacklisted_channel)
 
-    @Cog.listener()
-    async def on_message(self, message: Message):
+    @message_handler(order=10)
+    async def track_user_and_karma(self, ctx: MessageContext):
+        message = ctx.message
         # If the message is by a bot that's not irc then ignore it
-        if message.author.bot and not user_is_irc_bot(message):
+        if message.author.bot and not ctx.is_irc:
             return
 
-        user = get_database_user(message.author)
-        if not user:
-            user = User(user_uid=message.author.id, username=str(message.author))
-            db_session.add(user)
-        else:
-            user.last_seen = message.created_at
-        # Commit the session so the user is available now
-        try:
-            db_session.commit()
-        except (ScalarListException, SQLAlchemyError) as e:
-            db_session.rollback()
-            logging.exception(e)
-            # Something very wrong, but not way to reliably recover so abort
-            return
-
-        # Only log messages that were in a public channel
-        if isinstance(message.channel, GuildChannel):
-            # KARMA
-
-            # Get all specified command prefixes for the bot
-            command_prefixes = self.bot.command_prefix(self.bot, message)
-            # Only process karma if the message was not a command (ie did not start with a command prefix)
-            if not any(
-                message.content.startswith(prefix) for prefix in command_prefixes
-            ):
-                # process karma if apropriate
-                if search(r"\+\+|--|\+\-", message.content):
-                    reply = process_karma(
-                        message, message.id, db_session, CONFIG.KARMA_TIMEOUT
-                    )
-                    if reply:
-                        await message.channel.send(reply)
+        # Only process karma if the message was in a public channel and was not a
+        # command (ie did not start with a command prefix)
+        wants_karma = (
+            ctx.in_guild
+            and not ctx.classification.is_command
+            and ctx.classification.has_karma_operator
+        )
+        async with event_session() as session:
+            reply = await session.run_sync(
+                lambda s: track_user_and_karma(message, wants_karma, s)
+            )
+        if reply:
+            await message.channel.send(reply)
 
 
 async def setup(bot: Bot):
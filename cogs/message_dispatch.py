@@ -0,0 +1,149 @@
+import inspect
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from discord import Message
+from discord.abc import GuildChannel
+from discord.ext import commands
+from discord.ext.commands import Bot, Cog, Context, check
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db_session
+from utils import is_compsoc_exec_in_guild, user_is_irc_bot
+from utils.message_classification import MessageClassification, classify_message
+from utils.query_stats import track_queries
+
+MessageHandler = Callable[["MessageContext"], Awaitable[None]]
+
+
+@dataclass
+class MessageContext:
+    """Everything the message handlers share, worked out once per message"""
+
+    message: Message
+    classification: MessageClassification
+    # Whether the message was sent in a guild channel (rather than a DM)
+    in_guild: bool
+    # Whether the message was relayed by the IRC bridge
+    is_irc: bool
+    # The content with any IRC nick stripped, which is what commands are parsed from
+    content: str
+    # Set by a handler to keep the handlers after it from seeing the message
+    stop: bool = False
+
+
+@dataclass
+class HandlerTiming:
+    calls: int = 0
+    total: float = 0
+    slowest: float = 0
+    queries: int = 0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.calls if self.calls else 0
+
+    @property
+    def mean_queries(self) -> float:
+        return self.queries / self.calls if self.calls else 0
+
+
+def message_handler(order: int):
+    """Mark a cog method as a message handler, run by MessageDispatch in ascending order
+
+    Handlers are awaited one after the other, so anything slow should be spawned as a
+    task rather than holding up the handlers after it. A handler can set ctx.stop to
+    skip the handlers after it.
+    """
+
+    def decorator(func: MessageHandler) -> MessageHandler:
+        func.__message_handler_order__ = order  # type: ignore
+        return func
+
+    return decorator
+
+
+def irc_content(message: Message) -> str:
+    # Search for first "> " and strip the message from there (Since irc nicks can't have <, > in them
+    idx = message.content.find(">** ")
+    return message.content[idx + 4 :]
+
+
+class MessageDispatch(Cog):
+    """The only on_message listener, fanning each message out to the message handlers"""
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.timings: Dict[str, HandlerTiming] = {}
+        self._handlers: List[Tuple[str, MessageHandler]] = []
+        self._handlers_for: Tuple[int, ...] = ()
+
+    def handlers(self) -> List[Tuple[str, MessageHandler]]:
+        # Cogs can be loaded in any order and reloaded at any time, so collect the
+        # handlers again whenever the set of cogs changes
+        cogs = tuple(id(cog) for cog in self.bot.cogs.values())
+        if cogs != self._handlers_for:
+            found = []
+            for cog_name, cog in self.bot.cogs.items():
+                for name, method in inspect.getmembers(cog, inspect.ismethod):
+                    order = getattr(method, "__message_handler_order__", None)
+                    if order is not None:
+                        found.append((order, f"{cog_name}.{name}", method))
+            found.sort(key=lambda h: h[0])
+            self._handlers = [(name, method) for _, name, method in found]
+            self._handlers_for = cogs
+        return self._handlers
+
+    def build_context(self, message: Message) -> MessageContext:
+        is_irc = user_is_irc_bot(message)
+        return MessageContext(
+            message=message,
+            classification=classify_message(self.bot, message),
+            in_guild=isinstance(message.channel, GuildChannel),
+            is_irc=is_irc,
+            content=irc_content(message) if is_irc else message.content,
+        )
+
+    @Cog.listener()
+    async def on_message(self, message: Message):
+        with track_queries("message"):
+            ctx = self.build_context(message)
+            for name, handler in self.handlers():
+                await self.run_handler(name, handler, ctx)
+                if ctx.stop:
+                    break
+
+    async def run_handler(
+        self, name: str, handler: MessageHandler, ctx: MessageContext
+    ):
+        start = time.perf_counter()
+        with track_queries(f"message handler {name}") as stats:
+            try:
+                await handler(ctx)
+            except Exception as e:
+                # One broken handler shouldn't stop the rest from seeing the message
+                logging.exception(f"Message handler {name} failed")
+                if isinstance(e, SQLAlchemyError):
+                    db_session.rollback()
+        elapsed = time.perf_counter() - start
+        timing = self.timings.setdefault(name, HandlerTiming())
+        timing.calls += 1
+        timing.total += elapsed
+        timing.slowest = max(timing.slowest, elapsed)
+        timing.queries += stats.queries
+
+    @commands.hybrid_command()
+    @check(is_compsoc_exec_in_guild)
+    async def handler_timings(self, ctx: Context[Bot]):
+        """Show how long each message handler has taken, and how many queries it runs"""
+        lines = [
+            f"{name}: {t.calls} calls, mean {1000 * t.mean:.2f}ms, slowest {1000 * t.slowest:.2f}ms, {t.mean_queries:.1f} queries"
+            for name, t in self.timings.items()
+        ]
+        await ctx.reply("\n".join(lines) or "No messages handled yet")
+
+
+async def setup(bot: Bot):
+    await bot.add_cog(MessageDispatch(bot))
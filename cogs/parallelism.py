@@ -2,9 +2,24 @@ from __future__ import annotations
 
 import asyncio
 import concurrent.futures
+from typing import Callable, List
 
 from discord.ext.commands import Bot, Cog
 
+# Run once in each new worker process, so slow setup isn't paid by the first job
+_process_initializers: List[Callable[[], None]] = []
+
+
+def register_process_initializer(func: Callable[[], None]):
+    """Register a picklable (module level) function to warm up worker processes"""
+    if func not in _process_initializers:
+        _process_initializers.append(func)
+
+
+def _run_process_initializers(initializers: List[Callable[[], None]]):
+    for initializer in initializers:
+        initializer()
+
 
 class Parallelism(Cog):
     def __init__(self, bot: Bot):
@@ -31,7 +46,10 @@ class Parallelism(Cog):
     @property
     def process_pool(self):
         if self._process_pool is None:
-            self._process_pool = concurrent.futures.ProcessPoolExecutor()
+            self._process_pool = concurrent.futures.ProcessPoolExecutor(
+                initializer=_run_process_initializers,
+                initargs=(list(_process_initializers),),
+            )
         return self._process_pool
 
     @process_pool.deleter
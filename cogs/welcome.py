@@ -11,7 +11,7 @@ from sqlalchemy_utils import ScalarListException
 from config import CONFIG
 from models import db_session
 from models.user import User
-from utils import get_database_user
+from utils import get_database_user, invalidate_database_user
 
 
 class Category:
@@ -62,6 +62,7 @@ class Welcome(Cog):
         except (ScalarListException, SQLAlchemyError) as e:
             logging.exception(e)
             db_session.rollback()
+        invalidate_database_user(member.id)
 
         # Send welcome on join, if membership verification is not enabled
         if "MEMBER_VERIFICATION_GATE_ENABLED" not in member.guild.features:
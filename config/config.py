@@ -35,7 +35,17 @@ class Config:
         # Configuration
         self.LOG_LEVEL: str = parsed.get("log_level")
         self.SQL_LOGGING: bool = parsed.get("log_sql")
+        self.DATABASE_POOL_SIZE: int = parsed.get("database_pool_size", 5)
+        self.DATABASE_MAX_OVERFLOW: int = parsed.get("database_max_overflow", 10)
+        self.DATABASE_POOL_TIMEOUT: int = parsed.get("database_pool_timeout", 30)
+        self.DATABASE_POOL_RECYCLE: int = parsed.get("database_pool_recycle", 1800)
+        self.DATABASE_POOL_PRE_PING: bool = parsed.get("database_pool_pre_ping", True)
         self.KARMA_TIMEOUT: int = parsed.get("karma_cooldown")
+        self.KARMA_PARSER: str = parsed.get("karma_parser", "parsita")
+        self.USER_CACHE_SIZE: int = parsed.get("user_cache_size", 1024)
+        self.USER_CACHE_TTL: int = parsed.get("user_cache_ttl", 300)
+        self.SLOW_EVENT_QUERIES: int = parsed.get("slow_event_queries", 20)
+        self.SLOW_EVENT_DB_TIME: float = parsed.get("slow_event_db_time", 0.5)
         self.REMINDER_SEARCH_INTERVAL: int = parsed.get("reminder_search_interval")
         self.CHANNEL_CHECK_INTERVAL: int = parsed.get("channel_check_interval")
         self.ANNOUNCEMENT_SEARCH_INTERVAL: int = parsed.get(
@@ -44,6 +54,7 @@ class Config:
         self.ANNOUNCEMENT_IMPERSONATE: int = parsed.get("announcement_impersonate")
         self.UNICODE_NORMALISATION_FORM: str = "NFKD"
         self.PYROMANIAC_URL: str = parsed.get("pyromaniac_url")
+        self.DICE_WORKERS: int = parsed.get("dice_workers", 2)
 
         # Unused
         self.UWCS_MEMBER_ROLE_ID: int = parsed.get("UWCS_member_role_id")
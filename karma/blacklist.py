@@ -0,0 +1,30 @@
+from sqlalchemy.orm import Session
+
+from models.karma import BlockedKarma
+from utils.cache import CachedSet
+
+
+class KarmaBlacklist:
+    """The karma blacklist, cached so that filtering karma doesn't touch the database.
+
+    The blacklist only changes through the blacklist cog, which calls invalidate.
+    """
+
+    def __init__(self):
+        self._topics = CachedSet(
+            lambda db_session: {
+                topic.casefold() for (topic,) in db_session.query(BlockedKarma.topic)
+            }
+        )
+
+    def load(self, db_session: Session):
+        self._topics.load(db_session)
+
+    def invalidate(self):
+        self._topics.invalidate()
+
+    def contains(self, topic: str, db_session: Session) -> bool:
+        return topic.casefold() in self._topics.get(db_session)
+
+
+karma_blacklist = KarmaBlacklist()
@@ -1,9 +1,9 @@
 import logging
 import unicodedata
 from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
 
 from discord import Message
-from sqlalchemy import desc
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from sqlalchemy_utils import ScalarListException
@@ -17,17 +17,53 @@ from karma.transaction import (
     filter_transactions,
     make_transactions,
 )
-from models.channel_settings import MiniKarmaChannel
 from models.karma import Karma, KarmaChange
+from models.user import User
 from utils import filter_out_none, get_database_user, get_name_string
+from utils.channel_settings import channel_settings
 
 
-def is_in_cooldown(last_change, timeout):
+def is_in_cooldown(last_changed_at: datetime, timeout):
     timeout_time = datetime.utcnow() - timedelta(seconds=timeout)
-    return last_change.created_at > timeout_time
+    return last_changed_at > timeout_time
+
+
+def topic_transformations(topic: str) -> List[str]:
+    """All the spellings a topic may already be stored under, in order of preference"""
+    topic = topic.casefold()
+    if len(topic) <= 1:
+        return [topic]
+
+    candidates = []
+    normalised = unicodedata.normalize(CONFIG.UNICODE_NORMALISATION_FORM, topic)
+    stripped = "".join(c for c in normalised if not unicodedata.combining(c))
+    for t in (topic, normalised, stripped):
+        candidates += [t, t.replace(" ", "_"), t.replace("_", " ")]
+    # Keep the first occurrence of each spelling, preserving order
+    return list(dict.fromkeys(candidates))
+
+
+def find_karma_items(topics: Iterable[str], db_session: Session) -> Dict[str, Karma]:
+    """Fetch the karma items matching any spelling of the given topics in one query
+
+    The result is keyed by normalised name, to be probed with topic_transformations.
+    """
+    candidates = {c for topic in topics for c in topic_transformations(topic)}
+    if not candidates:
+        return {}
+    karma_items = (
+        db_session.query(Karma).filter(Karma.normalised_name.in_(candidates)).all()
+    )
+    return {k.normalised_name: k for k in karma_items}
 
 
-def process_karma(message: Message, message_id: int, db_session: Session, timeout: int):
+def process_karma(
+    message: Message,
+    message_id: int,
+    db_session: Session,
+    timeout: int,
+    user: Optional[User] = None,
+):
     reply = ""
 
     # Parse the message for karma modifications
@@ -42,19 +78,15 @@ def process_karma(message: Message, message_id: int, db_session: Session, timeou
 
     # TODO: Protect from byte-limit length chars
 
-    # Get karma-ing user
-    user = get_database_user(message.author)
+    # Get karma-ing user, if the caller hasn't already
+    if user is None:
+        user = get_database_user(message.author)
 
     # Get whether the channel is on mini karma or not
-    channel = (
-        db_session.query(MiniKarmaChannel)
-        .filter(MiniKarmaChannel.channel == message.channel.id)
-        .one_or_none()
-    )
-    if channel is None:
-        karma_mode = MiniKarmaMode.Normal
-    else:
+    if channel_settings.is_mini_karma(message.channel.id, db_session):
         karma_mode = MiniKarmaMode.Mini
+    else:
+        karma_mode = MiniKarmaMode.Normal
 
     def own_karma_error(topic):
         if karma_mode == MiniKarmaMode.Normal:
@@ -124,8 +156,15 @@ def process_karma(message: Message, message_id: int, db_session: Session, timeou
 
     items = []
     errors = []
+    succeeded = []
+
+    # Look up every topic in the message up front with a single query
+    known_items = find_karma_items(
+        (t.karma_item.topic for t in transactions), db_session
+    )
 
-    # Iterate over the transactions to write them to the database
+    # Iterate over the transactions, writing them all in a single database transaction
+    # Each topic gets its own savepoint so a failure only discards that topic's changes
     for transaction in transactions:
         # Truncate the topic safely so we 2000 char karmas can be used
         truncated_name = (
@@ -139,133 +178,77 @@ def process_karma(message: Message, message_id: int, db_session: Session, timeou
             errors.append(own_karma_error(truncated_name))
             continue
 
-        def topic_transformations():
-            def query(t):
-                return db_session.query(Karma).filter(Karma.name.ilike(t)).one_or_none()
-
-            topic = transaction.karma_item.topic.casefold()
-            yield query(topic)
-            if len(topic) <= 1:
-                return
-            yield query(topic.replace(" ", "_"))
-            yield query(topic.replace("_", " "))
-            topic = unicodedata.normalize(CONFIG.UNICODE_NORMALISATION_FORM, topic)
-            yield query(topic)
-            yield query(topic.replace(" ", "_"))
-            yield query(topic.replace("_", " "))
-            topic = "".join(c for c in topic if not unicodedata.combining(c))
-            yield query(topic)
-            yield query(topic.replace(" ", "_"))
-            yield query(topic.replace("_", " "))
-
         # Get the karma item from the database if it exists
-        karma_item = next(filter_out_none(topic_transformations()), None)
-
-        # Update or create the karma item
-        if not karma_item:
-            karma_item = Karma(name=transaction.karma_item.topic)
-            db_session.add(karma_item)
-            try:
-                db_session.commit()
-            except (ScalarListException, SQLAlchemyError) as e:
-                db_session.rollback()
-                logging.exception(e)
-                errors.append(internal_error(truncated_name))
-                continue
-
-        # Get the last change (or none if there was none)
-        last_change = (
-            db_session.query(KarmaChange)
-            .filter(KarmaChange.karma_id == karma_item.id)
-            .order_by(desc(KarmaChange.created_at))
-            .first()
+        karma_item = next(
+            filter_out_none(
+                known_items.get(t)
+                for t in topic_transformations(transaction.karma_item.topic)
+            ),
+            None,
         )
 
-        if not last_change:
-            # If the bot is being downvoted then the karma can only go up
-            if transaction.karma_item.topic.casefold() == "apollo":
-                new_score = abs(transaction.karma_item.operation.value)
-            else:
-                new_score = transaction.karma_item.operation.value
-
-            karma_change = KarmaChange(
-                karma_id=karma_item.id,
-                user_id=user.id,
-                message_id=message_id,
-                reason=transaction.karma_item.reason,
-                change=new_score,
-                score=new_score,
-                created_at=datetime.utcnow(),
-            )
-            db_session.add(karma_change)
-            try:
-                db_session.commit()
-            except (ScalarListException, SQLAlchemyError) as e:
-                db_session.rollback()
-                logging.exception(e)
-                errors.append(internal_error(truncated_name))
-                continue
-        else:
-            time_delta = datetime.utcnow() - last_change.created_at
-            if is_in_cooldown(last_change, timeout):
-                errors.append(cooldown_error(truncated_name, time_delta))
-                continue
-
-            # If the bot is being downvoted then the karma can only go up
-            if transaction.karma_item.topic.casefold() == "apollo":
-                new_score = last_change.score + abs(
-                    transaction.karma_item.operation.value
-                )
-            else:
-                new_score = last_change.score + transaction.karma_item.operation.value
-
-            karma_change = KarmaChange(
-                karma_id=karma_item.id,
-                user_id=user.id,
-                message_id=message_id,
-                reason=transaction.karma_item.reason,
-                score=new_score,
-                change=(new_score - last_change.score),
-                created_at=datetime.utcnow(),
-            )
-            db_session.add(karma_change)
-            try:
-                db_session.commit()
-            except (ScalarListException, SQLAlchemyError) as e:
-                db_session.rollback()
-                logging.exception(e)
-                errors.append(internal_error(truncated_name))
+        try:
+            with db_session.begin_nested():
+                # Create the karma item if needed, flushing so that it has an id
+                if not karma_item:
+                    karma_item = Karma(name=transaction.karma_item.topic)
+                    db_session.add(karma_item)
+                    db_session.flush()
+
+                if karma_item.last_changed_at and is_in_cooldown(
+                    karma_item.last_changed_at, timeout
+                ):
+                    time_delta = datetime.utcnow() - karma_item.last_changed_at
+                    errors.append(cooldown_error(truncated_name, time_delta))
+                    continue
+
+                # If the bot is being downvoted then the karma can only go up
+                if transaction.karma_item.topic.casefold() == "apollo":
+                    change = abs(transaction.karma_item.operation.value)
+                else:
+                    change = transaction.karma_item.operation.value
+                new_score = karma_item.score + change
+                changed_at = datetime.utcnow()
+
                 karma_change = KarmaChange(
                     karma_id=karma_item.id,
                     user_id=user.id,
                     message_id=message_id,
                     reason=transaction.karma_item.reason,
+                    change=change,
                     score=new_score,
-                    change=(new_score - last_change.score),
-                    created_at=datetime.utcnow(),
+                    created_at=changed_at,
                 )
                 db_session.add(karma_change)
-                try:
-                    db_session.commit()
-                except (ScalarListException, SQLAlchemyError) as e:
-                    db_session.rollback()
-                    logging.exception(e)
-                    errors.append(internal_error(truncated_name))
-                    continue
 
-        # Update karma counts
-        if transaction.karma_item.operation.value == 0:
-            karma_item.neutrals = karma_item.neutrals + 1
-        elif transaction.karma_item.operation.value == 1:
-            karma_item.pluses = karma_item.pluses + 1
-        elif transaction.karma_item.operation.value == -1:
-            # Make sure the changed operation is updated
-            if transaction.karma_item.topic.casefold() == "apollo":
-                karma_item.pluses = karma_item.pluses + 1
-            else:
-                karma_item.minuses = karma_item.minuses + 1
+                # Update the karma item's current score and counts
+                karma_item.score = new_score
+                karma_item.last_changed_at = changed_at
+                if transaction.karma_item.operation.value == 0:
+                    karma_item.neutrals = karma_item.neutrals + 1
+                elif change == 1:
+                    karma_item.pluses = karma_item.pluses + 1
+                else:
+                    karma_item.minuses = karma_item.minuses + 1
+        except (ScalarListException, SQLAlchemyError) as e:
+            logging.exception(e)
+            errors.append(internal_error(truncated_name))
+            continue
 
+        # Later topics in this message may be alternate spellings of this one
+        known_items[karma_item.normalised_name] = karma_item
         items.append(success_item(transaction))
+        succeeded.append(truncated_name)
+
+    # Commit every change from this message at once
+    try:
+        db_session.commit()
+    except (ScalarListException, SQLAlchemyError) as e:
+        logging.exception(e)
+        db_session.rollback()
+        # Nothing was written, so report every item that looked successful as failed
+        items = []
+        errors += [internal_error(name) for name in succeeded]
 
     # Get the name, either from discord or irc
     author_display = get_name_string(message)
@@ -288,10 +271,4 @@ def process_karma(message: Message, message_id: int, db_session: Session, timeou
         error_str = " ".join(errors)
         reply = " ".join(filter(None, ["Changes:", item_str, error_str]))
 
-    # Commit any changes (in case of any DB inconsistencies)
-    try:
-        db_session.commit()
-    except (ScalarListException, SQLAlchemyError) as e:
-        logging.exception(e)
-        db_session.rollback()
     return reply.rstrip()
@@ -1,11 +1,12 @@
 import re
 from dataclasses import dataclass
 from enum import Enum
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional
 
 from parsita import TextParsers, opt, reg, rep
 from parsita.util import constant
 
+from config import CONFIG
 from utils.utils import filter_out_none
 
 
@@ -50,11 +51,19 @@ def make_op_regex(o):
     return rf"{non_op_pre}{o}{non_op_post}{allowed_post}"
 
 
+# Patterns shared by both parser engines, so that they accept exactly the same language
+WORD_TOPIC = r'[^"\s]+?(?=[+-]{2})'
+STRING_TOPIC = r'".*?(?<!\\)(\\\\)*?"(?=[+-]{2})'
+BRACKET_REASON = r"\(.+?\)"
+QUOTE_REASON = r'".*?(?<!\\)(\\\\)*?"(?![+-]{2})'
+TEXT_REASON = r'[^",]+'
+
+
 class KarmaParser(TextParsers):
     anything = reg(r".") > constant(None)
 
-    word_topic = reg(r'[^"\s]+?(?=[+-]{2})')
-    string_topic = reg(r'".*?(?<!\\)(\\\\)*?"(?=[+-]{2})')
+    word_topic = reg(WORD_TOPIC)
+    string_topic = reg(STRING_TOPIC)
     topic = (word_topic > (lambda t: [t, False])) | (
         string_topic > (lambda t: [t[1:-1], True])
     )
@@ -66,10 +75,10 @@ class KarmaParser(TextParsers):
     op_negative = reg(make_op_regex(r"--")) > constant(KarmaOperation.NEGATIVE)
     operator = op_positive | op_neutral | op_negative
 
-    bracket_reason = reg(r"\(.+?\)") > (lambda s: s[1:-1])
-    quote_reason = reg(r'".*?(?<!\\)(\\\\)*?"(?![+-]{2})') > (lambda s: s[1:-1])
+    bracket_reason = reg(BRACKET_REASON) > (lambda s: s[1:-1])
+    quote_reason = reg(QUOTE_REASON) > (lambda s: s[1:-1])
     reason_words = reg(r"(?i)because") | reg(r"(?i)for")
-    text_reason = reason_words >> (reg(r'[^",]+') | quote_reason)
+    text_reason = reason_words >> (reg(TEXT_REASON) | quote_reason)
     reason = bracket_reason | quote_reason | text_reason
 
     karma = (topic & operator & opt(reason)) > make_karma
@@ -77,9 +86,107 @@ class KarmaParser(TextParsers):
     parse_all = rep(karma | anything) > filter_out_none
 
 
-def parse_message_content(content: str) -> List[KarmaItem]:
-    cleaned = re.sub(r"```.*?```", " ", content, flags=re.DOTALL)
-    cleaned = re.sub(r"`.*?`", " ", cleaned, flags=re.DOTALL)
+class KarmaScanner:
+    """Single pass equivalent of KarmaParser.parse_all
+
+    Rather than trying the whole karma grammar at every character, this jumps between
+    operator candidates, using the same patterns as KarmaParser for each piece.
+    """
+
+    whitespace = re.compile(r"\s*")
+    run = re.compile(r'[^"\s]*')
+    has_operator = re.compile(r"[+-]{2}")
+
+    word_topic = re.compile(WORD_TOPIC)
+    string_topic = re.compile(STRING_TOPIC)
+    operator = re.compile(make_op_regex(r"(\+\+|\+-|-\+|--)"))
+    operations = {
+        "++": KarmaOperation.POSITIVE,
+        "+-": KarmaOperation.NEUTRAL,
+        "-+": KarmaOperation.NEUTRAL,
+        "--": KarmaOperation.NEGATIVE,
+    }
+
+    bracket_reason = re.compile(BRACKET_REASON)
+    quote_reason = re.compile(QUOTE_REASON)
+    reason_words = [re.compile(r"(?i)because"), re.compile(r"(?i)for")]
+    text_reason = re.compile(TEXT_REASON)
+
+    @classmethod
+    def skip_whitespace(cls, text: str, pos: int) -> int:
+        return cls.whitespace.match(text, pos).end()
+
+    @classmethod
+    def parse_reason(cls, text: str, pos: int):
+        """Match an optional reason at pos, returning the reason and where it ends"""
+        for pattern in (cls.bracket_reason, cls.quote_reason):
+            if match := pattern.match(text, pos):
+                return match.group()[1:-1], cls.skip_whitespace(text, match.end())
+
+        # Only the first reason word that matches is tried, as with parsita alternatives
+        words = next(
+            filter_out_none(p.match(text, pos) for p in cls.reason_words), None
+        )
+        if words is None:
+            return None, pos
+        after_words = cls.skip_whitespace(text, words.end())
+        if match := cls.text_reason.match(text, after_words):
+            return match.group(), cls.skip_whitespace(text, match.end())
+        if match := cls.quote_reason.match(text, after_words):
+            return match.group()[1:-1], cls.skip_whitespace(text, match.end())
+        return None, pos
+
+    @classmethod
+    def parse_all(cls, text: str) -> List[KarmaItem]:
+        items = []
+        if not cls.has_operator.search(text):
+            return items
+
+        pos = cls.skip_whitespace(text, 0)
+        while pos < len(text):
+            if text[pos] == '"':
+                topic_match = cls.string_topic.match(text, pos)
+                topic = topic_match and topic_match.group()[1:-1]
+                bypass = True
+            else:
+                topic_match = cls.word_topic.match(text, pos)
+                topic = topic_match and topic_match.group()
+                bypass = False
+
+            operator = topic_match and cls.operator.match(text, topic_match.end())
+            if operator:
+                after_operator = cls.skip_whitespace(text, operator.end())
+                reason, pos = cls.parse_reason(text, after_operator)
+                operation = cls.operations[operator.group(1)]
+                items.append(KarmaItem(topic, operation, reason, bypass))
+            elif bypass:
+                # A quote that isn't a topic is just an ordinary character
+                pos = cls.skip_whitespace(text, pos + 1)
+            elif topic_match:
+                # Every later start in this word finds the same operator, so skip to it
+                pos = topic_match.end()
+            else:
+                # No operator in the rest of this word
+                pos = cls.skip_whitespace(text, cls.run.match(text, pos).end())
+
+        return items
+
+
+PARSER_ENGINES: Dict[str, Callable[[str], List[KarmaItem]]] = {
+    "parsita": lambda text: list(KarmaParser.parse_all.parse(text).or_die()),
+    "scanner": KarmaScanner.parse_all,
+}
+
+
+CODE_BLOCK = re.compile(r"```.*?```", flags=re.DOTALL)
+INLINE_CODE = re.compile(r"`.*?`", flags=re.DOTALL)
+
+
+def parse_message_content(
+    content: str, engine: Optional[str] = None
+) -> List[KarmaItem]:
+    cleaned = CODE_BLOCK.sub(" ", content)
+    cleaned = INLINE_CODE.sub(" ", cleaned)
     if cleaned == "" or cleaned.isspace():
         return []
-    return list(KarmaParser.parse_all.parse(cleaned).or_die())
+    return PARSER_ENGINES[engine or CONFIG.KARMA_PARSER](cleaned)
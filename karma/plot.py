@@ -0,0 +1,140 @@
+"""Rendering karma plots, which runs in the Parallelism process pool.
+
+Nothing here touches the database; the bot sends each worker one array per topic.
+"""
+
+import io
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Tuple
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib import font_manager, rc_context
+from matplotlib.dates import (
+    DateFormatter,
+    DateLocator,
+    DayLocator,
+    HourLocator,
+    MinuteLocator,
+    MonthLocator,
+    WeekdayLocator,
+    YearLocator,
+    date2num,
+)
+from pytz import timezone, utc
+
+matplotlib.use("Agg")
+
+FONT_PATH = Path("resources", "Humor-Sans.ttf")
+# Plots are labelled in UK time, like the rest of the bot
+PLOT_TIMEZONE = timezone("Europe/London")
+
+_warmed = False
+
+
+def warm():
+    """Load the fonts a plot needs, once per process"""
+    global _warmed
+    if not _warmed:
+        font_manager.fontManager.addfont(str(FONT_PATH))
+        _warmed = True
+
+
+def changes_to_array(changes: Iterable) -> np.ndarray:
+    """Pack karma changes into an (n, 2) array of (POSIX timestamp, score)"""
+    return np.array(
+        [(utc.localize(c.created_at).timestamp(), c.score) for c in changes],
+        dtype=np.float64,
+    ).reshape(-1, 2)
+
+
+def timestamps_to_dates(timestamps: np.ndarray) -> np.ndarray:
+    """Convert POSIX timestamps to matplotlib's dates, which count days from its epoch"""
+    return date2num(datetime(1970, 1, 1)) + timestamps / 86400
+
+
+def date_axis(span: timedelta) -> Tuple[DateFormatter, DateLocator, DateLocator]:
+    """The date format and major and minor tick locators for a plot covering span"""
+    if span <= timedelta(hours=1):
+        date_format = DateFormatter("%H:%M %d %b %Y", tz=PLOT_TIMEZONE)
+        date_locator_major = MinuteLocator(interval=15, tz=PLOT_TIMEZONE)
+        date_locator_minor = MinuteLocator(tz=PLOT_TIMEZONE)
+    elif span <= timedelta(hours=6):
+        date_format = DateFormatter("%H:%M %d %b %Y", tz=PLOT_TIMEZONE)
+        date_locator_major = HourLocator(tz=PLOT_TIMEZONE)
+        date_locator_minor = MinuteLocator(interval=15, tz=PLOT_TIMEZONE)
+    elif span <= timedelta(days=14):
+        date_format = DateFormatter("%d %b %Y", tz=PLOT_TIMEZONE)
+        date_locator_major = DayLocator(tz=PLOT_TIMEZONE)
+        date_locator_minor = HourLocator(interval=6, tz=PLOT_TIMEZONE)
+    elif span <= timedelta(days=30):
+        date_format = DateFormatter("%d %b %Y", tz=PLOT_TIMEZONE)
+        date_locator_major = WeekdayLocator(tz=PLOT_TIMEZONE)
+        date_locator_minor = DayLocator(tz=PLOT_TIMEZONE)
+    elif span <= timedelta(days=365):
+        date_format = DateFormatter("%B %Y", tz=PLOT_TIMEZONE)
+        date_locator_major = MonthLocator(tz=PLOT_TIMEZONE)
+        date_locator_minor = WeekdayLocator(interval=2, tz=PLOT_TIMEZONE)
+    else:
+        date_format = DateFormatter("%Y", tz=PLOT_TIMEZONE)
+        date_locator_major = YearLocator(tz=PLOT_TIMEZONE)
+        date_locator_minor = MonthLocator(tz=PLOT_TIMEZONE)
+    return date_format, date_locator_major, date_locator_minor
+
+
+def render_karma_plot(timelines: Dict[str, np.ndarray], xkcd: bool = False) -> bytes:
+    """Plot each topic's (timestamp, score) array against time, returning a PNG"""
+    warm()
+    xkcd_context = plt.xkcd if xkcd else nullcontext
+    line_width = plt.rcParams["grid.linewidth"]
+
+    # xkcd context sets grid.linewidth to 0 which causes an error with ax.grid.
+    # Setting it back to the initial line width fixes this.
+    with xkcd_context(), rc_context(
+        {"grid.linewidth": line_width, "figure.autolayout": True}
+    ):
+        fig, ax = plt.subplots(figsize=(8, 6))
+
+    dates = {karma: timestamps_to_dates(t[:, 0]) for karma, t in timelines.items()}
+
+    # Get the earliest and latest karma values
+    earliest_karma = min(d[0] for d in dates.values())
+    latest_karma = max(d[-1] for d in dates.values())
+    karma_timeline = timedelta(days=latest_karma - earliest_karma)
+
+    date_format, date_locator_major, date_locator_minor = date_axis(karma_timeline)
+
+    for karma, time in dates.items():
+        scores = timelines[karma][:, 1]
+
+        # Plot the values
+        ax.xaxis.set_major_locator(date_locator_major)
+        ax.xaxis.set_minor_locator(date_locator_minor)
+        ax.xaxis.set_major_formatter(date_format)
+        ax.grid(visible=True, which="minor", color="0.9", linestyle=":")
+        ax.grid(visible=True, which="major", color="0.5", linestyle="--")
+        ax.set(
+            xlabel="Time",
+            ylabel="Karma",
+            xlim=[
+                time[0] - ((time[-1] - time[0]) * 0.05),
+                time[-1] + ((time[-1] - time[0]) * 0.05),
+            ],
+        )
+        (line,) = ax.plot_date(time, scores, "-", xdate=True)
+        line.set_label(karma)
+
+    # Create a legend if more than  1 line and format the dates
+    if len(timelines) > 1:
+        with xkcd_context():
+            ax.legend()
+    fig.autofmt_xdate()
+
+    img = io.BytesIO()
+    with xkcd_context():
+        fig.savefig(img, dpi=240, transparent=False, format="png")
+    plt.close(fig)
+    return img.getvalue()
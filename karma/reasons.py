@@ -0,0 +1,68 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from models.karma import KarmaChange
+
+REASONS_PAGE_SIZE = 10
+
+# Changes are paged in (created_at, message_id) order, message_id breaking ties
+PageKey = Tuple[datetime, int]
+
+
+@dataclass
+class ReasonsPage:
+    # (reason, change) pairs, oldest first
+    reasons: List[Tuple[str, int]]
+    first: Optional[PageKey]
+    last: Optional[PageKey]
+    has_previous: bool
+    has_next: bool
+
+
+def fetch_reasons_page(
+    karma_id: int,
+    db_session: Session,
+    after: Optional[PageKey] = None,
+    before: Optional[PageKey] = None,
+    size: int = REASONS_PAGE_SIZE,
+) -> ReasonsPage:
+    """Fetch one page of a topic's reasons, after or before the key of another page.
+
+    Pages are found by seeking on the (karma_id, created_at) index rather than with an
+    offset, so every page only reads the rows it shows.
+    """
+    key = tuple_(KarmaChange.created_at, KarmaChange.message_id)
+    query = select(
+        KarmaChange.created_at,
+        KarmaChange.message_id,
+        KarmaChange.reason,
+        KarmaChange.change,
+    ).where(KarmaChange.karma_id == karma_id, KarmaChange.reason.isnot(None))
+
+    # Fetch one extra row to find out whether there's another page in that direction
+    if before is not None:
+        query = query.where(key < before).order_by(
+            KarmaChange.created_at.desc(), KarmaChange.message_id.desc()
+        )
+        rows = db_session.execute(query.limit(size + 1)).all()
+        has_previous, has_next = len(rows) > size, True
+        rows = rows[:size][::-1]
+    else:
+        if after is not None:
+            query = query.where(key > after)
+        query = query.order_by(KarmaChange.created_at, KarmaChange.message_id)
+        rows = db_session.execute(query.limit(size + 1)).all()
+        has_previous, has_next = after is not None, len(rows) > size
+        rows = rows[:size]
+
+    return ReasonsPage(
+        reasons=[(row.reason, row.change) for row in rows],
+        first=(rows[0].created_at, rows[0].message_id) if rows else None,
+        last=(rows[-1].created_at, rows[-1].message_id) if rows else None,
+        has_previous=has_previous,
+        has_next=has_next,
+    )
@@ -0,0 +1,67 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import distinct, func, select
+from sqlalchemy.orm import Session
+
+from models.karma import Karma, KarmaChange
+from models.user import User
+from utils.cache import LRUCache
+
+
+@dataclass(frozen=True)
+class KarmaStats:
+    changes: int
+    users: int
+    # Discord ID of the user that has changed the topic the most, and how many times
+    top_user_uid: Optional[int]
+    top_user_changes: int
+    # None when the topic has never been changed
+    first_change: Optional[datetime]
+    last_change: Optional[datetime]
+
+
+# Keyed on the time of the latest change as well, so a new change is a cache miss
+_stats_cache: LRUCache[Tuple[int, Optional[datetime]], KarmaStats] = LRUCache(128)
+
+
+def _query_karma_stats(karma_id: int, db_session: Session) -> KarmaStats:
+    changes, users, first_change, last_change = db_session.execute(
+        select(
+            func.count(),
+            func.count(distinct(KarmaChange.user_id)),
+            func.min(KarmaChange.created_at),
+            func.max(KarmaChange.created_at),
+        ).where(KarmaChange.karma_id == karma_id)
+    ).one()
+    if not changes:
+        return KarmaStats(0, 0, None, 0, None, None)
+
+    # Ties go to whoever got there first
+    top_user_uid, top_user_changes = db_session.execute(
+        select(User.user_uid, func.count())
+        .select_from(KarmaChange)
+        .join(User, User.id == KarmaChange.user_id)
+        .where(KarmaChange.karma_id == karma_id)
+        .group_by(KarmaChange.user_id, User.user_uid)
+        .order_by(func.count().desc(), func.min(KarmaChange.created_at))
+        .limit(1)
+    ).one()
+
+    return KarmaStats(
+        changes=changes,
+        users=users,
+        top_user_uid=top_user_uid,
+        top_user_changes=top_user_changes,
+        first_change=first_change,
+        last_change=last_change,
+    )
+
+
+def get_karma_stats(karma_item: Karma, db_session: Session) -> KarmaStats:
+    """Aggregate the changes to a karma topic, which may not have been karma'd yet"""
+    return _stats_cache.get_or_load(
+        (karma_item.id, karma_item.last_changed_at),
+        lambda key: _query_karma_stats(key[0], db_session),
+    )
@@ -0,0 +1,36 @@
+"""Index karma leaderboards
+
+Revision ID: 0d6f2c8e4b91
+Revises: e4a9b3c15f70
+Create Date: 2026-10-18 15:12:40.551092
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0d6f2c8e4b91"
+down_revision = "e4a9b3c15f70"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("karma", schema=None) as batch_op:
+        batch_op.drop_index("ix_karma_score")
+        batch_op.create_index("ix_karma_score_name", ["score", "name"], unique=False)
+
+    op.create_index(
+        "ix_karma_total_karma_name",
+        "karma",
+        [sa.text("(pluses + minuses) + neutrals DESC"), "name"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_karma_total_karma_name", table_name="karma")
+
+    with op.batch_alter_table("karma", schema=None) as batch_op:
+        batch_op.drop_index("ix_karma_score_name")
+        batch_op.create_index("ix_karma_score", ["score"], unique=False)
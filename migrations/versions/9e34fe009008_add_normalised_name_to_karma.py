@@ -0,0 +1,53 @@
+"""Add normalised_name to karma
+
+Revision ID: 9e34fe009008
+Revises: 951a5ce4741b
+Create Date: 2026-10-18 10:12:31.204118
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9e34fe009008"
+down_revision = "951a5ce4741b"
+branch_labels = None
+depends_on = None
+
+
+karma = sa.table(
+    "karma",
+    sa.column("id", sa.Integer),
+    sa.column("name", sa.String),
+    sa.column("normalised_name", sa.String),
+)
+
+
+def upgrade():
+    with op.batch_alter_table("karma", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("normalised_name", sa.String(), nullable=True))
+
+    # casefold is not available in SQL, so the backfill is done in Python
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(karma.c.id, karma.c.name)).all()
+    if rows:
+        bind.execute(
+            karma.update()
+            .where(karma.c.id == sa.bindparam("karma_id"))
+            .values(normalised_name=sa.bindparam("normalised")),
+            [{"karma_id": id_, "normalised": name.casefold()} for id_, name in rows],
+        )
+
+    with op.batch_alter_table("karma", schema=None) as batch_op:
+        batch_op.alter_column(
+            "normalised_name", existing_type=sa.String(), nullable=False
+        )
+        batch_op.create_index(
+            batch_op.f("ix_karma_normalised_name"), ["normalised_name"], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("karma", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_karma_normalised_name"))
+        batch_op.drop_column("normalised_name")
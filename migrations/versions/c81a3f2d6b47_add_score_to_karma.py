@@ -0,0 +1,67 @@
+"""Add score and last_changed_at to karma
+
+Revision ID: c81a3f2d6b47
+Revises: 9e34fe009008
+Create Date: 2026-10-18 11:02:47.913580
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c81a3f2d6b47"
+down_revision = "9e34fe009008"
+branch_labels = None
+depends_on = None
+
+
+karma = sa.table(
+    "karma",
+    sa.column("id", sa.Integer),
+    sa.column("score", sa.Integer),
+    sa.column("last_changed_at", sa.DateTime),
+)
+karma_changes = sa.table(
+    "karma_changes",
+    sa.column("karma_id", sa.Integer),
+    sa.column("created_at", sa.DateTime),
+    sa.column("score", sa.Integer),
+)
+
+
+def upgrade():
+    with op.batch_alter_table("karma", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("score", sa.Integer(), nullable=False, server_default="0")
+        )
+        batch_op.add_column(sa.Column("last_changed_at", sa.DateTime(), nullable=True))
+
+    # Backfill both columns from the latest change of each karma item
+    latest_score = (
+        sa.select(karma_changes.c.score)
+        .where(karma_changes.c.karma_id == karma.c.id)
+        .order_by(karma_changes.c.created_at.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    latest_change = (
+        sa.select(sa.func.max(karma_changes.c.created_at))
+        .where(karma_changes.c.karma_id == karma.c.id)
+        .scalar_subquery()
+    )
+    op.execute(
+        karma.update().values(
+            score=sa.func.coalesce(latest_score, 0), last_changed_at=latest_change
+        )
+    )
+
+    with op.batch_alter_table("karma", schema=None) as batch_op:
+        batch_op.alter_column("score", existing_type=sa.Integer(), server_default=None)
+        batch_op.create_index(batch_op.f("ix_karma_score"), ["score"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("karma", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_karma_score"))
+        batch_op.drop_column("last_changed_at")
+        batch_op.drop_column("score")
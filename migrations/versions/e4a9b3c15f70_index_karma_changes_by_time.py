@@ -0,0 +1,28 @@
+"""Index karma changes by karma and time
+
+Revision ID: e4a9b3c15f70
+Revises: c81a3f2d6b47
+Create Date: 2026-10-18 14:03:52.118640
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e4a9b3c15f70"
+down_revision = "c81a3f2d6b47"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("karma_changes", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_karma_changes_karma_id_created_at",
+            ["karma_id", "created_at"],
+            unique=False,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("karma_changes", schema=None) as batch_op:
+        batch_op.drop_index("ix_karma_changes_karma_id_created_at")
@@ -5,7 +5,7 @@ from datetime import datetime
 from typing import TYPE_CHECKING
 
 from pytz import timezone, utc
-from sqlalchemy import ForeignKey, func
+from sqlalchemy import ForeignKey, Index, func
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -19,6 +19,10 @@ if TYPE_CHECKING:
 
 class KarmaChange(Base):
     __tablename__ = "karma_changes"
+    # (karma_id, user_id) is already covered by the primary key
+    __table_args__ = (
+        Index("ix_karma_changes_karma_id_created_at", "karma_id", "created_at"),
+    )
 
     karma_id: Mapped[int] = mapped_column(ForeignKey("karma.id"), primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
@@ -42,6 +46,8 @@ class Karma(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True, init=False)
     name: Mapped[str]
+    # casefolded copy of name, so topics can be looked up by index rather than ILIKE
+    normalised_name: Mapped[str] = mapped_column(index=True, init=False)
 
     changes: Mapped[list["KarmaChange"]] = relationship(
         back_populates="karma", order_by=KarmaChange.created_at.asc(), init=False
@@ -53,6 +59,12 @@ class Karma(Base):
     pluses: Mapped[int] = mapped_column(default=0)
     minuses: Mapped[int] = mapped_column(default=0)
     neutrals: Mapped[int] = mapped_column(default=0)
+    # denormalised from the latest KarmaChange, kept in step by process_karma
+    score: Mapped[int] = mapped_column(default=0)
+    last_changed_at: Mapped[datetime | None] = mapped_column(default=None)
+
+    def __post_init__(self):
+        self.normalised_name = self.name.casefold()
 
     @hybrid_property
     def net_score(self):
@@ -63,6 +75,12 @@ class Karma(Base):
         return self.pluses + self.minuses + self.neutrals
 
 
+# The leaderboards (karma top, bottom and most) read straight from these, with the
+# name as a tie break
+Index("ix_karma_score_name", Karma.score, Karma.name)
+Index("ix_karma_total_karma_name", Karma.total_karma.desc(), Karma.name)
+
+
 class BlockedKarma(Base):
     __tablename__ = "blacklist"
 
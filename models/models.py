@@ -1,18 +1,93 @@
 import logging
-from typing import Annotated
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import cache
+from typing import Annotated, Any, AsyncIterator, Dict, Optional
 
-from sqlalchemy import BigInteger, ForeignKey, MetaData, create_engine
+from sqlalchemy import URL, BigInteger, ForeignKey, MetaData, create_engine, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import DeclarativeBase, MappedAsDataclass, Session, mapped_column
 
 from config import CONFIG
+from models.pool import track_checkouts
+
+
+def engine_options(url: URL) -> Dict[str, Any]:
+    # SQLite connections are cheap and its pools aren't sized
+    if url.get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": CONFIG.DATABASE_POOL_SIZE,
+        "max_overflow": CONFIG.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": CONFIG.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": CONFIG.DATABASE_POOL_RECYCLE,
+        # Test connections as they're checked out, so that the pool recovers from
+        # the database restarting rather than handing out dead connections
+        "pool_pre_ping": CONFIG.DATABASE_POOL_PRE_PING,
+    }
+
+
+database_url = make_url(CONFIG.DATABASE_CONNECTION)
 
 # this is bad, redo this
-engine = create_engine(CONFIG.DATABASE_CONNECTION)
+engine = create_engine(database_url, **engine_options(database_url))
+track_checkouts(engine)
 if CONFIG.SQL_LOGGING:
     logging.basicConfig()
-    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    # INFO logs each statement, WARNING would only log what's logged anyway
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
 db_session = Session(bind=engine, future=True)
 
+# The async driver for each database, psycopg 3 is both sync and async
+ASYNC_DRIVERS = {"postgresql": "psycopg", "sqlite": "aiosqlite"}
+
+_event_session: ContextVar[Optional[AsyncSession]] = ContextVar(
+    "event_session", default=None
+)
+
+
+@cache
+def get_async_engine() -> AsyncEngine:
+    """Created on first use, so that importing models doesn't need the async driver"""
+    backend = database_url.get_backend_name()
+    url = database_url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    async_engine = create_async_engine(url, **engine_options(url))
+    track_checkouts(async_engine.sync_engine)
+    return async_engine
+
+
+@cache
+def get_async_sessions() -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(get_async_engine(), expire_on_commit=False)
+
+
+@asynccontextmanager
+async def event_session() -> AsyncIterator[AsyncSession]:
+    """The session for the event (message, command, loop iteration) being handled.
+
+    The first use in an event opens a session, which everything else handling the same
+    event shares, and which is closed when that first use exits. Unlike db_session,
+    queries don't block the event loop and each event has its own transaction.
+    Synchronous code can be given the session with `await session.run_sync(...)`.
+    """
+    session = _event_session.get()
+    if session is not None:
+        yield session
+        return
+
+    async with get_async_sessions()() as session:
+        token = _event_session.set(session)
+        try:
+            yield session
+        finally:
+            _event_session.reset(token)
+
+
 # some useful re-usable column types
 # dataclass args (init, default) cannot be part of annotations and must be explicit
 IntPk = Annotated[int, mapped_column(primary_key=True)]
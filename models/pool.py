@@ -0,0 +1,50 @@
+from dataclasses import dataclass
+from typing import Any
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import Engine, event
+from sqlalchemy.pool import QueuePool
+
+
+@dataclass
+class PoolCheckouts:
+    """How busy the pool was each time a connection was checked out of it"""
+
+    checkouts: int = 0
+    # Checkouts made while every connection in the pool itself was in use
+    overflowing: int = 0
+    most_checked_out: int = 0
+
+    def record(self, pool: QueuePool):
+        self.checkouts += 1
+        if pool.overflow() > 0:
+            self.overflowing += 1
+        self.most_checked_out = max(self.most_checked_out, pool.checkedout())
+
+
+_checkouts: "WeakKeyDictionary[Engine, PoolCheckouts]" = WeakKeyDictionary()
+
+
+def track_checkouts(engine: Engine):
+    """Record every checkout from the engine's pool, for pool_stats"""
+    checkouts = _checkouts[engine] = PoolCheckouts()
+
+    def on_checkout(*args: Any):
+        # The pool is looked up each time, as disposing the engine replaces it
+        if isinstance(engine.pool, QueuePool):
+            checkouts.record(engine.pool)
+
+    event.listen(engine, "checkout", on_checkout)
+
+
+def pool_stats(engine: Engine) -> str:
+    pool = engine.pool
+    checkouts = _checkouts.get(engine)
+    if checkouts is None or not isinstance(pool, QueuePool):
+        return pool.status()
+    return (
+        f"{pool.checkedout()} of {pool.size()} checked out"
+        f" ({max(pool.overflow(), 0)} overflow),"
+        f" {checkouts.checkouts} checkouts with {checkouts.overflowing} in overflow"
+        f" and at most {checkouts.most_checked_out} checked out at once"
+    )
@@ -1,11 +1,51 @@
-import logging
+import os
 import random
 from abc import ABC, abstractmethod
 from enum import Enum, auto
 
+import numpy as np
+
 import roll.exceptions as rollerr
 
-MAX_ROLLS = 1000
+MAX_ROLLS = 1000000
+# Larger dice are rolled in Python, since NumPy can't sum their rolls without overflowing
+MAX_NUMPY_SIDES = 2**32
+# Numbers larger than this can't all be represented exactly as floats
+MAX_EXACT_FLOAT = 2**53
+# Rolls are generated a chunk at a time, so that many dice don't need much memory
+ROLL_CHUNK = 2**20
+
+_generator = np.random.default_rng()
+
+
+def _reseed():
+    # Forked dice workers would otherwise all roll the same numbers (random does this too)
+    global _generator
+    _generator = np.random.default_rng()
+
+
+os.register_at_fork(after_in_child=_reseed)
+
+
+def roll_dice(counts, sides):
+    """Rolls counts[i] dice with sides[i] sides for each i, returning an array of totals
+
+    Every count must be positive, and every number of sides between 1 and MAX_NUMPY_SIDES
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    sides = np.asarray(sides, dtype=np.int64)
+    totals = np.empty(len(counts), dtype=np.int64)
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(counts):
+        # As many totals as fit in a chunk, but always at least one
+        offset = ends[start - 1] if start else 0
+        stop = max(start + 1, np.searchsorted(ends, offset + ROLL_CHUNK, "right"))
+        chunk = counts[start:stop]
+        rolls = _generator.integers(1, np.repeat(sides[start:stop], chunk) + 1)
+        totals[start:stop] = np.add.reduceat(rolls, np.cumsum(chunk) - chunk)
+        start = stop
+    return totals
 
 
 def isfunction(token):
@@ -16,12 +56,10 @@ class Environment:
     def __init__(self, root):
         self.root = root
         self.closure = {}
-        self.trace = []
 
     def copy(self):
         out = Environment(self.root)
         out.closure = self.closure.copy()
-        out.trace = self.trace
         return out
 
 
@@ -31,7 +69,6 @@ class HashCounter:
     def __init__(self):
         self.__next_id = 0
         self.__next_scope_id = -1
-        self.trace = []
 
     @property
     def next_id(self):
@@ -52,22 +89,26 @@ class HashCounter:
         return id
 
 
-def trace(func):
-    """A decorator that updates the environment/counter to know its position in the current expression"""
-
-    def wrapper(*args, **kwargs):
-        # args[0] will be self (the expression token object)
-        # args[1] should always be the env/map object
-        args[1].trace.append(args[0])
-        out = func(*args, **kwargs)
-        args[1].trace.pop()
-        return out
+def trace_from(traceback):
+    """Reconstructs the tokens being reduced or hashed when an exception was raised
 
-    return wrapper
+    Nothing keeps track of this during evaluation, it is read off the frames the exception
+    passed through, so it only costs anything when something goes wrong.
+    """
+    trace = []
+    while traceback is not None:
+        frame = traceback.tb_frame
+        name = frame.f_code.co_name
+        token = frame.f_locals.get("self")
+        if (name == "reduce" and isinstance(token, IToken)) or (
+            name == "hash_vars" and isinstance(token, (IToken, Program))
+        ):
+            trace.append(token)
+        traceback = traceback.tb_next
+    return trace
 
 
 class IToken(ABC):
-    @trace
     @abstractmethod
     def reduce(self, env, counter):
         """Returns a fully reduced version of the token"""
@@ -87,7 +128,6 @@ class IToken(ABC):
         """Attempts to deference the token if it is a pointer"""
         return self
 
-    @trace
     @abstractmethod
     def hash_vars(self, counter, map):
         """Recursively sets the IDs of variables to be unique"""
@@ -105,16 +145,13 @@ class IPure(ABC):
 class TokenNumber(IToken, IPure):
     def __init__(self, value):
         self.__value = value
-        logging.debug(self.__class__.__name__, self)
 
-    @trace
     def reduce(self, env, counter):
         return self
 
     def substitute(self, _):
         return TokenNumber(self.__value)
 
-    @trace
     def hash_vars(self, counter, map):
         pass
 
@@ -132,16 +169,13 @@ class TokenNumber(IToken, IPure):
 class TokenString(IToken, IPure):
     def __init__(self, value):
         self.__value = value
-        logging.debug(self.__class__.__name__, self)
 
-    @trace
     def reduce(self, env, counter):
         return self
 
     def substitute(self, _):
         return TokenString(self.__value)
 
-    @trace
     def hash_vars(self, counter, map):
         pass
 
@@ -162,36 +196,36 @@ class TokenRoll(IToken):
     def __init__(self, count, sides):
         self.count = count
         self.sides = sides
-        logging.debug(self.__class__.__name__, self)
 
-    @trace
     def reduce(self, env, counter):
         sides = self.sides.reduce(env, counter).pure
         if sides == 0:
-            raise rollerr.ZeroDiceSidesError(env.trace)
+            raise rollerr.ZeroDiceSidesError()
         if sides < 0:
-            raise rollerr.NegativeDiceSidesError(env.trace, sides)
+            raise rollerr.NegativeDiceSidesError(sides)
         if int(sides) != sides:
-            raise rollerr.FloatingPointDiceSidesError(env.trace, sides)
+            raise rollerr.FloatingPointDiceSidesError(sides)
         count = self.count.reduce(env, counter).pure
         if count == 0:
-            raise rollerr.ZeroDiceCountError(env.trace)
+            raise rollerr.ZeroDiceCountError()
         if count < 0:
-            raise rollerr.NegativeDiceCountError(env.trace, count)
+            raise rollerr.NegativeDiceCountError(count)
         if int(count) != count:
-            raise rollerr.FloatingPointDiceCountError(env.trace, count)
+            raise rollerr.FloatingPointDiceCountError(count)
         if sides == 1:
             return TokenNumber(count)
         if count > MAX_ROLLS:
-            raise rollerr.ExcessiveDiceRollsError(env.trace)
-        return TokenNumber(sum(random.choices(range(1, sides + 1), k=count)))
+            raise rollerr.ExcessiveDiceRollsError()
+        count, sides = int(count), int(sides)
+        if sides > MAX_NUMPY_SIDES:
+            return TokenNumber(sum(random.choices(range(1, sides + 1), k=count)))
+        return TokenNumber(int(roll_dice([count], [sides])[0]))
 
     def substitute(self, old_to_new):
         return TokenRoll(
             self.count.substitute(old_to_new), self.sides.substitute(old_to_new)
         )
 
-    @trace
     def hash_vars(self, counter, map):
         self.count.hash_vars(counter, map)
         self.sides.hash_vars(counter, map)
@@ -210,9 +244,7 @@ class TokenVariable(IToken):
     def __init__(self, name, id=None):
         self.name = name
         self.identifier = hash(name) if id is None else id
-        logging.debug(self.__class__.__name__, self)
 
-    @trace
     def reduce(self, env, counter):
         return self.dereference(env).reduce(env, counter)
 
@@ -224,12 +256,11 @@ class TokenVariable(IToken):
             else self.identifier,
         )
 
-    @trace
     def hash_vars(self, counter, map):
         try:
             self.identifier = map[self.name]
         except KeyError:
-            raise rollerr.UndefinedIdentifierError(counter.trace, self.name)
+            raise rollerr.UndefinedIdentifierError(self.name)
 
     def __str__(self):
         return f"{self.name}"  # _{self.identifier}"
@@ -239,7 +270,7 @@ class TokenVariable(IToken):
         try:
             return env.closure[id].dereference(env)
         except KeyError:
-            raise rollerr.UndefinedIdentifierError(env.trace, self.name)
+            raise rollerr.UndefinedIdentifierError(self.name)
 
 
 class TokenLet(IToken):
@@ -248,9 +279,7 @@ class TokenLet(IToken):
     def __init__(self, declarations, expression):
         self.declarations = declarations
         self.expression = expression
-        logging.debug(self.__class__.__name__, self)
 
-    @trace
     def reduce(self, env, counter):
         new_env = self.update_env(env)
         return self.expression.reduce(new_env, counter)
@@ -273,7 +302,6 @@ class TokenLet(IToken):
         # Return reconstructed let statement
         return TokenLet(new_decls, new_expr)
 
-    @trace
     def hash_vars(self, counter, map):
         new_map = map.copy()
         for i in range(len(self.declarations)):
@@ -300,9 +328,7 @@ class TokenFunction(IToken):
         self.arg_name = arg_name
         self.arg_id = arg_id if arg_id is not None else hash(arg_name)
         self.expression = expression
-        logging.debug(self.__class__.__name__, self)
 
-    @trace
     def reduce(self, env, counter):
         return self
 
@@ -316,7 +342,6 @@ class TokenFunction(IToken):
         # Return reconstructed function statement
         return TokenFunction(self.arg_name, new_expr, self.arg_id)
 
-    @trace
     def hash_vars(self, counter, map):
         new_map = map.copy()
         new_map[self.arg_name] = counter.next_id
@@ -332,9 +357,7 @@ class TokenApplication(IToken):
     def __init__(self, lhs, rhs):
         self.lhs = lhs
         self.rhs = rhs
-        logging.debug(self.__class__.__name__, self)
 
-    @trace
     def reduce(self, env, counter):
         # Apply as many arguments as possible (assumes the application is valid)
         # May result in a partially-applied function
@@ -384,7 +407,6 @@ class TokenApplication(IToken):
         rhs = [expr.substitute(old_to_new) for expr in self.rhs]
         return TokenApplication(lhs, rhs)
 
-    @trace
     def hash_vars(self, counter, map):
         self.lhs.hash_vars(counter, map)
         for expr in self.rhs:
@@ -450,20 +472,37 @@ class TokenOperator(IToken):
         Operator.NOT: lambda xs: 0 if xs[0] else 1,
         Operator.NEG: lambda xs: -xs[0],
     }
+    # The same operators for arrays of floats, used to sample and work out distributions
+    array_mapping = {
+        Operator.EQ: np.equal,
+        Operator.NE: np.not_equal,
+        Operator.GE: np.greater_equal,
+        Operator.GT: np.greater,
+        Operator.LE: np.less_equal,
+        Operator.LT: np.less,
+        # int(x and y) and int(x or y), which can truncate
+        Operator.AND: lambda x, y: np.trunc(np.where(x != 0, y, x)),
+        Operator.OR: lambda x, y: np.trunc(np.where(x != 0, x, y)),
+        Operator.ADD: np.add,
+        Operator.SUB: np.subtract,
+        Operator.MUL: np.multiply,
+        Operator.DIV: np.divide,
+        Operator.POW: np.power,
+        Operator.NOT: lambda x: x == 0,
+        Operator.NEG: np.negative,
+    }
 
     def __init__(self, op, args):
         self.op = op
         self.args = args
-        logging.debug(self.__class__.__name__, self)
 
-    @trace
     def reduce(self, env, counter):
         try:
             value = TokenOperator.mapping[self.op](
                 [a.reduce(env, counter).pure for a in self.args]
             )
         except ZeroDivisionError:
-            raise rollerr.ZeroDivisionError(env.trace)
+            raise rollerr.ZeroDivisionError()
 
         # Convert True and False to 1 and 0, respectively. Leave other values alone.
         if value is True:
@@ -478,7 +517,6 @@ class TokenOperator(IToken):
             new_args.append(arg.substitute(old_to_new))
         return TokenOperator(self.op, new_args)
 
-    @trace
     def hash_vars(self, counter, map):
         for arg in self.args:
             arg.hash_vars(counter, map)
@@ -495,9 +533,7 @@ class TokenTernary(IToken):
         self.condition = condition
         self.true = true
         self.false = false
-        logging.debug(self.__class__.__name__, self)
 
-    @trace
     def reduce(self, env, counter):
         return (
             self.true.reduce(env, counter)
@@ -514,7 +550,6 @@ class TokenTernary(IToken):
     def rolls(self, env):
         return self.condition.rolls(env) + self.true.rolls(env) + self.false.rolls(env)
 
-    @trace
     def hash_vars(self, counter, map):
         self.condition.hash_vars(counter, map)
         self.true.hash_vars(counter, map)
@@ -528,15 +563,13 @@ class TokenCase(IToken):
     def __init__(self, expression, pairs):
         self.expression = expression
         self.pairs = pairs
-        logging.debug(self.__class__.__name__, self)
 
-    @trace
     def reduce(self, env, counter):
         value = self.expression.reduce(env, counter).pure
         for pair in self.pairs:
             if value == pair[0].reduce(env, counter).pure:
                 return pair[1].reduce(env, counter)
-        raise rollerr.CaseFailureError(env.trace)
+        raise rollerr.CaseFailureError()
 
     def substitute(self, old_to_new):
         new_expr = self.expression.substitute(old_to_new)
@@ -547,7 +580,6 @@ class TokenCase(IToken):
             )
         return TokenCase(new_expr, new_pairs)
 
-    @trace
     def hash_vars(self, counter, map):
         self.expression.hash_vars(counter, map)
         for pair in self.pairs:
@@ -580,16 +612,19 @@ class Program:
         # Create environment and hash counter
         self.environment = Environment(self)
         self.counter = HashCounter()
-        # Debug
-        logging.debug(self.__class__.__name__, self)
 
     def reduce(self):
-        """Intentionally does not use the @trace decorator"""
-        self.hash_vars(self.counter, {})
-        out = [let.reduce(self.environment, self.counter) for let in self.lets]
+        # Hashing starts again from scratch, so the same program can be reduced repeatedly
+        self.environment = Environment(self)
+        self.counter = HashCounter()
+        try:
+            self.hash_vars(self.counter, {})
+            out = [let.reduce(self.environment, self.counter) for let in self.lets]
+        except rollerr.TracedError as e:
+            e.add_trace(trace_from(e.__traceback__))
+            raise
         return out
 
-    @trace
     def hash_vars(self, counter, map):
         for a in self.assignments:
             map[a.name] = counter.next_id
@@ -0,0 +1,221 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+import roll.exceptions as rollerr
+from roll.ast import (
+    MAX_EXACT_FLOAT,
+    MAX_ROLLS,
+    Operator,
+    TokenNumber,
+    TokenOperator,
+    TokenRoll,
+    TokenTernary,
+)
+
+# Distributions with more outcomes than this are too expensive to work out
+MAX_OUTCOMES = 10000
+# Combinations of outcomes considered for one operator or roll
+MAX_COMBINATIONS = 1000000
+
+
+@dataclass
+class Distribution:
+    """The probability of each outcome of an expression, with the outcomes in order"""
+
+    outcomes: np.ndarray
+    probabilities: np.ndarray
+
+    @classmethod
+    def of(cls, outcomes, probabilities):
+        """Makes a distribution, merging any repeated outcomes"""
+        if len(outcomes) > MAX_COMBINATIONS:
+            raise rollerr.DistributionError("too many combinations of outcomes")
+        outcomes, inverse = np.unique(outcomes, return_inverse=True)
+        if len(outcomes) > MAX_OUTCOMES:
+            raise rollerr.DistributionError("too many outcomes")
+        return cls(outcomes, np.bincount(inverse, weights=probabilities))
+
+    @classmethod
+    def constant(cls, value):
+        # Outcomes are floats, which would round larger numbers
+        if abs(value) > MAX_EXACT_FLOAT:
+            raise rollerr.DistributionError(f"{value} is too large")
+        return cls(np.array([float(value)]), np.array([1.0]))
+
+    @classmethod
+    def mixture(cls, weighted):
+        """The distribution of picking one of several distributions with some probability"""
+        weighted = [(w, d) for w, d in weighted if w > 0]
+        return cls.of(
+            np.concatenate([d.outcomes for _, d in weighted]),
+            np.concatenate([w * d.probabilities for w, d in weighted]),
+        )
+
+    def possible(self):
+        """The outcomes that can actually happen"""
+        return self.outcomes[self.probabilities > 0]
+
+    @property
+    def mean(self):
+        return float(self.outcomes @ self.probabilities)
+
+    @property
+    def variance(self):
+        return float((self.outcomes - self.mean) ** 2 @ self.probabilities)
+
+
+@lru_cache(maxsize=256)
+def dice_sum(count, sides):
+    """The probabilities of totals count to count * sides when rolling count dice"""
+    die = np.full(sides, 1 / sides)
+    total = np.array([1.0])
+    # Square-and-multiply, so that many dice need only a few convolutions
+    while count:
+        if count & 1:
+            total = np.convolve(total, die)
+        count >>= 1
+        if count:
+            die = np.convolve(die, die)
+    total.setflags(write=False)
+    return total
+
+
+def pure(value):
+    """Converts an outcome back to the int or float evaluation would have made"""
+    return int(value) if value == int(value) else float(value)
+
+
+class DistributionBuilder:
+    """Works out the exact distribution of numbers, rolls, operators and ternaries
+
+    Each distinct sub-expression is only worked out once. Anything that could raise an
+    error when evaluated raises it here too, and anything else raises DistributionError.
+    """
+
+    def __init__(self):
+        self.memo = {}
+
+    def of(self, token):
+        key = str(token)
+        if key not in self.memo:
+            try:
+                self.memo[key] = self.build(token)
+            except rollerr.TracedError as e:
+                # Each token adds itself as the error passes back up through it
+                e.trace.insert(0, token)
+                raise
+        return self.memo[key]
+
+    def build(self, token):
+        if isinstance(token, TokenNumber):
+            return Distribution.constant(token.pure)
+        if isinstance(token, TokenRoll):
+            return self.build_roll(token)
+        if isinstance(token, TokenOperator):
+            return self.build_operator(token)
+        if isinstance(token, TokenTernary):
+            return self.build_ternary(token)
+        raise rollerr.DistributionError(
+            "only numbers, dice, operators and ternaries are supported"
+        )
+
+    def build_roll(self, token):
+        # The same checks as TokenRoll.reduce, against every possible roll
+        sides = self.of(token.sides)
+        possible_sides = sides.possible()
+        if np.any(possible_sides == 0):
+            raise rollerr.ZeroDiceSidesError()
+        if np.any(possible_sides < 0):
+            raise rollerr.NegativeDiceSidesError(pure(possible_sides.min()))
+        fractional = possible_sides[possible_sides != np.trunc(possible_sides)]
+        if len(fractional):
+            raise rollerr.FloatingPointDiceSidesError(pure(fractional[0]))
+        counts = self.of(token.count)
+        possible_counts = counts.possible()
+        if np.any(possible_counts == 0):
+            raise rollerr.ZeroDiceCountError()
+        if np.any(possible_counts < 0):
+            raise rollerr.NegativeDiceCountError(pure(possible_counts.min()))
+        fractional = possible_counts[possible_counts != np.trunc(possible_counts)]
+        if len(fractional):
+            raise rollerr.FloatingPointDiceCountError(pure(fractional[0]))
+
+        weighted = []
+        combinations = 0
+        for count, count_probability in zip(counts.outcomes, counts.probabilities):
+            for side, side_probability in zip(sides.outcomes, sides.probabilities):
+                weight = count_probability * side_probability
+                if weight == 0:
+                    continue
+                if side == 1:
+                    weighted.append((weight, Distribution.constant(count)))
+                    continue
+                if count > MAX_ROLLS:
+                    raise rollerr.ExcessiveDiceRollsError()
+                if count * (side - 1) + 1 > MAX_OUTCOMES:
+                    raise rollerr.DistributionError(
+                        f"{pure(count)}d{pure(side)} has too many outcomes"
+                    )
+                combinations += count * (side - 1) + 1
+                if combinations > MAX_COMBINATIONS:
+                    raise rollerr.DistributionError("too many combinations of outcomes")
+                totals = dice_sum(int(count), int(side))
+                outcomes = np.arange(count, count * side + 1, dtype=np.float64)
+                weighted.append((weight, Distribution(outcomes, totals)))
+        return Distribution.mixture(weighted)
+
+    def build_operator(self, token):
+        args = [self.of(arg) for arg in token.args]
+        if len(args) == 1:
+            outcomes = args[0].outcomes
+            probabilities = args[0].probabilities
+            with np.errstate(all="ignore"):
+                results = TokenOperator.array_mapping[token.op](outcomes)
+        else:
+            lhs, rhs = args
+            if token.op == Operator.DIV and np.any(rhs.possible() == 0):
+                raise rollerr.ZeroDivisionError()
+            if len(lhs.outcomes) * len(rhs.outcomes) > MAX_COMBINATIONS:
+                raise rollerr.DistributionError("too many combinations of outcomes")
+            # Every combination of outcomes from each side
+            outcomes = np.meshgrid(lhs.outcomes, rhs.outcomes, indexing="ij")
+            probabilities = np.outer(lhs.probabilities, rhs.probabilities).ravel()
+            with np.errstate(all="ignore"):
+                results = TokenOperator.array_mapping[token.op](*outcomes).ravel()
+        results = np.asarray(results, dtype=np.float64)
+        # Also false for NaN, and for results that have already been rounded
+        if not np.all(np.abs(results[probabilities > 0]) <= MAX_EXACT_FLOAT):
+            raise rollerr.DistributionError(f"{token} can be too large or not real")
+        return Distribution.of(results, probabilities)
+
+    def build_ternary(self, token):
+        condition = self.of(token.condition)
+        possible = condition.probabilities > 0
+        true = possible & (condition.outcomes != 0)
+        false = possible & (condition.outcomes == 0)
+        # Only a branch that can be taken is worked out, as only that could fail
+        branches = []
+        if np.any(true):
+            branches.append((condition.probabilities[true].sum(), self.of(token.true)))
+        if np.any(false):
+            branches.append(
+                (condition.probabilities[false].sum(), self.of(token.false))
+            )
+        return Distribution.mixture(branches)
+
+
+def program_distribution(program):
+    """Works out the exact distribution of a program's only expression"""
+    if len(program.expressions) != 1 or program.assignments:
+        raise rollerr.DistributionError("only a single expression without functions")
+    try:
+        return DistributionBuilder().of(program.expressions[0])
+    except rollerr.TracedError as e:
+        # Like Program.reduce's trace, the first element isn't shown
+        e.add_trace([program] + e.trace)
+        raise
+    except RecursionError:
+        # Each level of the expression takes a few more frames than evaluating it does
+        raise rollerr.DistributionError("the expression is nested too deeply")
@@ -6,6 +6,8 @@ from utils.exceptions import InternalError, WarningError
 
 def trace2log(trace):
     trace = trace[1:]  # The first element is always an empty let statement
+    if not trace:
+        return ""
     if len(trace) > 5:  # Limit the size of the trace to reduce error message size
         trace = trace[:2] + ["..."] + trace[-3:]
     out = "Exception in\n    " + "\nin\n    ".join(
@@ -14,61 +16,90 @@ def trace2log(trace):
     return out
 
 
+class TracedError(Exception):
+    """An error whose message says where in the program it was raised
+
+    The trace is filled in by Program.reduce once the error reaches it
+    """
+
+    def __init__(self, message, **fields):
+        self.template = message
+        self.fields = fields
+        self.add_trace([])
+
+    def add_trace(self, trace):
+        self.trace = trace
+        message = self.template.format(trace=trace2log(trace), **self.fields)
+        self.message = message.rstrip()
+        self.args = (self.message,)
+
+
 # User errors
 
 
-class RunTimeError(Exception, ABC):
+class RunTimeError(TracedError, ABC):
     """Raised when an error occurs while evaluating a program"""
 
     @abstractmethod
-    def __init__(self, trace, message="{trace}"):
-        self.message = message.format(trace=trace2log(trace))
-        super().__init__(self.message)
+    def __init__(self, message="{trace}", **fields):
+        super().__init__(message, **fields)
 
 
 class UndefinedIdentifierError(RunTimeError):
     """Raised when an unexpected identifier is detected"""
 
-    def __init__(
-        self, trace, identifier, message="'{id}' is not defined in scope\n{trace}"
-    ):
-        self.message = message.format(trace=trace2log(trace), id=identifier)
-        super().__init__([], self.message)
+    def __init__(self, identifier, message="'{id}' is not defined in scope\n{trace}"):
+        super().__init__(message, id=identifier)
 
 
 class CaseFailureError(RunTimeError):
     """Raised when the value given to a case statement has no matching pattern"""
 
-    def __init__(self, trace, message="Case for input not found\n{trace}"):
-        super().__init__(trace, message)
+    def __init__(self, message="Case for input not found\n{trace}"):
+        super().__init__(message)
 
 
 class ZeroDivisionError(RunTimeError):
     """Raised when dividing by zero"""
 
-    def __init__(self, trace, message="Division by zero\n{trace}"):
-        super().__init__(trace, message)
+    def __init__(self, message="Division by zero\n{trace}"):
+        super().__init__(message)
+
+
+class StatisticsError(RunTimeError):
+    """Raised when a program can't be sampled for statistics"""
+
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class DistributionError(RunTimeError):
+    """Raised when the exact distribution of a program can't be worked out"""
+
+    def __init__(
+        self, reason, message="Can't work out an exact distribution, {reason}\n{trace}"
+    ):
+        super().__init__(message, reason=reason)
 
 
-class ExcessiveDiceRollsError(WarningError):
+class ExcessiveDiceRollsError(TracedError, WarningError):
     """Raised when too many dice are rolled in a single command"""
 
     def __init__(
         self,
-        trace,
         out="You requested an excessive number of dice rolls.",
         message="Number of total dice rolls exceeded limit\n{trace}",
     ):
-        super().__init__(out, message.format(trace=trace2log(trace)))
+        self.out = out
+        super().__init__(message)
 
 
 class DiceInputError(RunTimeError, ABC):
     """Raised when there is an issue with the inputs of a die roll"""
 
     @abstractmethod
-    def __init__(self, trace, value, message="{value}\n{trace}"):
-        self.message = message.format(trace=trace2log(trace), value=value)
-        super().__init__([], self.message)
+    def __init__(self, value, message="{value}\n{trace}"):
+        super().__init__(message, value=value)
 
 
 class FloatingPointDiceInputError(DiceInputError, ABC):
@@ -82,11 +113,10 @@ class FloatingPointDiceCountError(FloatingPointDiceInputError):
 
     def __init__(
         self,
-        trace,
         value,
         message="Requested dice roll had a non-integer count: {value}\n{trace}",
     ):
-        super().__init__(trace, value, message)
+        super().__init__(value, message)
 
 
 class FloatingPointDiceSidesError(FloatingPointDiceInputError):
@@ -94,11 +124,10 @@ class FloatingPointDiceSidesError(FloatingPointDiceInputError):
 
     def __init__(
         self,
-        trace,
         value,
         message="Requested dice roll had a non-integer number of sides: {value}\n{trace}",
     ):
-        super().__init__(trace, value, message)
+        super().__init__(value, message)
 
 
 class ZeroDiceInputError(DiceInputError, ABC):
@@ -110,15 +139,15 @@ class ZeroDiceInputError(DiceInputError, ABC):
 class ZeroDiceCountError(ZeroDiceInputError):
     """Raised when the number of rolls of a die roll is zero"""
 
-    def __init__(self, trace, message="Requested dice roll a count of zero\n{trace}"):
-        super().__init__(trace, 0, message)
+    def __init__(self, message="Requested dice roll a count of zero\n{trace}"):
+        super().__init__(0, message)
 
 
 class ZeroDiceSidesError(ZeroDiceInputError):
     """Raised when the number of sides of a die roll is zero"""
 
-    def __init__(self, trace, message="Requested dice roll had zero sides\n{trace}"):
-        super().__init__(trace, 0, message)
+    def __init__(self, message="Requested dice roll had zero sides\n{trace}"):
+        super().__init__(0, message)
 
 
 class NegativeDiceInputError(DiceInputError, ABC):
@@ -132,11 +161,10 @@ class NegativeDiceCountError(NegativeDiceInputError):
 
     def __init__(
         self,
-        trace,
         value,
         message="Requested dice roll had a negative count: {value}\n{trace}",
     ):
-        super().__init__(trace, value, message)
+        super().__init__(value, message)
 
 
 class NegativeDiceSidesError(NegativeDiceInputError):
@@ -144,11 +172,10 @@ class NegativeDiceSidesError(NegativeDiceInputError):
 
     def __init__(
         self,
-        trace,
         value,
         message="Requested dice roll had a negative number of sides: {value}\n{trace}",
     ):
-        super().__init__(trace, value, message)
+        super().__init__(value, message)
 
 
 # Internal errors
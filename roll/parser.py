@@ -1,5 +1,6 @@
 # ruff:  noqa: F821 some abuse of python's binding mechanism goes on here I think
 import re
+from functools import lru_cache
 
 from parsita import ParseError, TextParsers, lit, opt, reg, rep, rep1, rep1sep, repsep
 from parsita.util import constant
@@ -20,6 +21,9 @@ from roll.ast import (
     TokenVariable,
 )
 
+# Parsing dominates the time taken by most rolls, and people repeat the same ones a lot
+PROGRAM_CACHE_SIZE = 256
+
 
 def bin_operator(xs):
     """xs = [item, [[sep, item], ... ]]"""
@@ -224,6 +228,21 @@ def parse_program(source: str):
     return ast
 
 
+@lru_cache(maxsize=PROGRAM_CACHE_SIZE)
+def _parse_program_cached(source: str):
+    return parse_program(source)
+
+
+def parse_program_cached(source: str):
+    """Like parse_program, but reuses the ASTs of recently parsed programs
+
+    Reducing a program starts it afresh, so the cached AST is returned as is and can be
+    evaluated any number of times. The cache belongs to the process, so each dice worker
+    has its own.
+    """
+    return _parse_program_cached(source.strip())
+
+
 def format_parse_error(err, source):
     found = re.search(r"(?<=but found ').*?(?=')", err.message)
     if found is None:
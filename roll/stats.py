@@ -0,0 +1,187 @@
+import io
+from dataclasses import dataclass
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+
+import roll.exceptions as rollerr
+from roll.ast import (
+    MAX_EXACT_FLOAT,
+    MAX_NUMPY_SIDES,
+    MAX_ROLLS,
+    Operator,
+    TokenNumber,
+    TokenOperator,
+    TokenRoll,
+    TokenTernary,
+    roll_dice,
+)
+
+matplotlib.use("Agg")
+
+# Samples taken in one batch, for expressions that can be
+BATCH_SAMPLES = 100000
+# Samples taken one at a time by evaluating the program, for everything else
+SLOW_SAMPLES = 2000
+# Dice rolled across a whole batch before falling back to sampling one at a time
+MAX_BATCH_ROLLS = 20000000
+# Integer results spanning at most this many values get a bar each in the histogram
+MAX_HISTOGRAM_BARS = 100
+
+
+class Unbatchable(Exception):
+    """Raised when an expression can't be sampled in a batch"""
+
+    pass
+
+
+class BatchSampler:
+    """Samples numbers, rolls, operators and ternaries many times at once with NumPy
+
+    Anything else, or anything that could raise an error when evaluated normally, raises
+    Unbatchable instead, so that evaluating normally can decide what happens.
+    """
+
+    def __init__(self):
+        self.rolls = 0
+
+    def sample(self, token, n):
+        if isinstance(token, TokenNumber):
+            return self.sample_number(token, n)
+        if isinstance(token, TokenRoll):
+            return self.sample_roll(token, n)
+        if isinstance(token, TokenOperator):
+            return self.sample_operator(token, n)
+        if isinstance(token, TokenTernary):
+            return self.sample_ternary(token, n)
+        raise Unbatchable
+
+    def sample_number(self, token, n):
+        # Floats can't hold every integer past this, so the result could be wrong
+        if abs(token.pure) > MAX_EXACT_FLOAT:
+            raise Unbatchable
+        return np.full(n, float(token.pure))
+
+    def sample_roll(self, token, n):
+        sides = self.sample(token.sides, n)
+        counts = self.sample(token.count, n)
+        if not (
+            np.all(sides >= 1)
+            and np.all(sides <= MAX_NUMPY_SIDES)
+            and np.all(counts >= 1)
+            and np.all(np.trunc(sides) == sides)
+            and np.all(np.trunc(counts) == counts)
+        ):
+            raise Unbatchable
+        # One-sided dice aren't rolled, or limited
+        rolled = sides > 1
+        if np.any(counts[rolled] > MAX_ROLLS):
+            raise Unbatchable
+        self.rolls += int(counts[rolled].sum())
+        if self.rolls > MAX_BATCH_ROLLS:
+            raise Unbatchable
+
+        out = counts.copy()
+        out[rolled] = roll_dice(counts[rolled], sides[rolled])
+        return out
+
+    def sample_operator(self, token, n):
+        args = [self.sample(arg, n) for arg in token.args]
+        if token.op == Operator.DIV and np.any(args[1] == 0):
+            raise Unbatchable
+        with np.errstate(all="ignore"):
+            out = np.asarray(
+                TokenOperator.array_mapping[token.op](*args), dtype=np.float64
+            )
+        # Python would have raised an error, or made a complex number
+        if not np.all(np.isfinite(out)):
+            raise Unbatchable
+        if np.any(np.abs(out) > MAX_EXACT_FLOAT):
+            raise Unbatchable
+        return out
+
+    def sample_ternary(self, token, n):
+        condition = self.sample(token.condition, n) != 0
+        out = np.empty(n)
+        # Each branch is only sampled as many times as it's taken
+        out[condition] = self.sample(token.true, int(condition.sum()))
+        out[~condition] = self.sample(token.false, n - int(condition.sum()))
+        return out
+
+
+def sample_once(program):
+    value = program.reduce()[0].pure
+    if isinstance(value, str):
+        raise rollerr.StatisticsError(
+            f"Statistics need a number, but the result was {value!r}"
+        )
+    return value
+
+
+def sample_program(program):
+    """Evaluates a program's expression many times, returning an array of the results
+
+    The array holds Python numbers instead of floats if any result is too large for a
+    float to hold exactly.
+    """
+    if len(program.expressions) != 1:
+        raise rollerr.StatisticsError("Statistics need exactly one expression")
+    if not program.assignments:
+        try:
+            return BatchSampler().sample(program.expressions[0], BATCH_SAMPLES)
+        except Unbatchable:
+            pass
+    samples = [sample_once(program) for _ in range(SLOW_SAMPLES)]
+    # Kept as Python numbers when floats can't hold them exactly
+    if any(abs(sample) > MAX_EXACT_FLOAT for sample in samples):
+        return np.array(samples, dtype=object)
+    return np.array(samples, dtype=float)
+
+
+@dataclass
+class Summary:
+    samples: int
+    mean: float
+    variance: float
+    minimum: float
+    maximum: float
+
+    @classmethod
+    def of(cls, values):
+        # Relative to the first value, so that large integers keep their differences
+        shifted = np.asarray(values - values[0], dtype=float)
+        return cls(
+            len(values),
+            float(values[0] + shifted.mean()),
+            float(shifted.var()),
+            values.min(),
+            values.max(),
+        )
+
+
+def render_histogram(values, title, probabilities=None):
+    """Plots how likely each result is, returning a PNG
+
+    Without probabilities, the values are samples and each one is equally likely
+    """
+    values = np.asarray(values, dtype=float)
+    if probabilities is None:
+        probabilities = np.full(len(values), 1 / len(values))
+    fig, ax = plt.subplots(figsize=(8, 5))
+    lowest, highest = values.min(), values.max()
+    if np.all(np.trunc(values) == values) and highest - lowest < MAX_HISTOGRAM_BARS:
+        outcomes, inverse = np.unique(values, return_inverse=True)
+        ax.bar(outcomes, np.bincount(inverse, weights=probabilities), width=0.8)
+    else:
+        heights, edges = np.histogram(values, bins=50, weights=probabilities)
+        ax.bar(edges[:-1], heights, width=np.diff(edges), align="edge")
+    ax.set_title(title)
+    ax.set_xlabel("Result")
+    ax.set_ylabel("Probability")
+    ax.grid(axis="y", alpha=0.3)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    plt.close(fig)
+    return buffer.getvalue()
@@ -2,10 +2,13 @@ import pretend
 
 TEST_USER = pretend.stub(name="Name", nick="Nick", id=1123456)
 IRC_USER = pretend.stub(name="irc", nick="irc", id=1337)
+TEST_CHANNEL = pretend.stub(id=7654321)
 
 
-def make_message_stub(content, author=TEST_USER):
-    return pretend.stub(content=content, clean_content=content, author=author)
+def make_message_stub(content, author=TEST_USER, channel=TEST_CHANNEL):
+    return pretend.stub(
+        content=content, clean_content=content, author=author, channel=channel
+    )
 
 
 def make_irc_message_stub(content):
@@ -7,6 +7,7 @@ from alembic.config import Config
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
 
+from karma.blacklist import karma_blacklist
 from karma.parser import KarmaItem, KarmaOperation
 from karma.transaction import KarmaTransaction, apply_blacklist
 from models import Base
@@ -118,3 +119,23 @@ TEST_CASES: dict[str, Tuple[list[KarmaTransaction], list[KarmaTransaction]]] = {
 def test_blacklist(database, transactions, expected):
     actual = apply_blacklist(transactions, database)
     assert actual == expected
+
+
+def test_blacklist_invalidate(database):
+    transactions = [
+        KarmaTransaction(KarmaItem("wordpad", KarmaOperation.POSITIVE, None), False)
+    ]
+    karma_blacklist.invalidate()
+    assert apply_blacklist(transactions, database) == transactions
+
+    # The cached blacklist doesn't see new items until it is invalidated
+    database.add(BlockedKarma(topic="wordpad", user_id=1))
+    database.commit()
+    assert apply_blacklist(transactions, database) == transactions
+
+    karma_blacklist.invalidate()
+    assert apply_blacklist(transactions, database) == []
+
+    database.query(BlockedKarma).filter(BlockedKarma.topic == "wordpad").delete()
+    database.commit()
+    karma_blacklist.invalidate()
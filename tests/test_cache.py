@@ -0,0 +1,86 @@
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session
+
+import utils.utils
+from models import Base
+from models.user import User
+from utils.cache import LRUCache
+from utils.utils import get_database_user_from_id
+
+
+def test_lru_cache_hits_and_misses():
+    cache = LRUCache(maxsize=2)
+    loads = []
+
+    def load(key):
+        loads.append(key)
+        return key.upper()
+
+    assert cache.get_or_load("a", load) == "A"
+    assert cache.get_or_load("a", load) == "A"
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert loads == ["a"]
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get_or_load("a", lambda key: 0)
+    cache.put("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get_or_load("a", lambda key: 0) == 1
+    assert cache.get_or_load("b", lambda key: 0) == 0
+
+
+def test_lru_cache_caches_none():
+    cache = LRUCache(maxsize=2)
+    cache.get_or_load("a", lambda key: None)
+
+    assert cache.get_or_load("a", lambda key: 1) is None
+    cache.invalidate("a")
+    assert cache.get_or_load("a", lambda key: 1) == 1
+
+
+def test_lru_cache_expires():
+    cache = LRUCache(maxsize=2, ttl=0)
+    cache.put("a", 1)
+
+    assert cache.get_or_load("a", lambda key: 2) == 2
+    assert cache.misses == 1
+
+
+def test_lru_cache_get():
+    cache = LRUCache(maxsize=2)
+
+    assert cache.get("a") is None
+    cache.put("a", b"png")
+    assert cache.get("a") == b"png"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.fixture
+def user_session(monkeypatch):
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    session = Session(bind=engine, future=True)
+    monkeypatch.setattr(utils.utils, "db_session", session)
+    monkeypatch.setattr(utils.utils, "user_cache", LRUCache(maxsize=2))
+    return session
+
+
+def test_cached_user_after_commit(user_session):
+    user_session.add(User(user_uid=1, username="before"))
+    user_session.commit()
+    assert get_database_user_from_id(1).username == "before"
+
+    user_session.execute(update(User).values(username="after"))
+    user_session.commit()
+
+    # The cached key still finds the user, which reloads rather than going stale
+    user = get_database_user_from_id(1)
+    assert utils.utils.user_cache.hits == 1
+    assert user in user_session
+    assert user.username == "after"
@@ -0,0 +1,36 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from models import Base
+from models.channel_settings import IgnoredChannel, MiniKarmaChannel
+from models.user import User
+from utils.channel_settings import ChannelSettings
+
+
+def test_channel_settings():
+    db_engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(db_engine)
+    db_session = Session(bind=db_engine, future=True)
+    user = User(user_uid=1, username="admin")
+    db_session.add(user)
+    db_session.flush()
+    db_session.add_all(
+        [
+            IgnoredChannel(channel=10, user_id=user.id),
+            MiniKarmaChannel(channel=20, user_id=user.id),
+        ]
+    )
+    db_session.commit()
+
+    settings = ChannelSettings()
+    assert settings.is_ignored(10, db_session)
+    assert not settings.is_ignored(20, db_session)
+    assert settings.is_mini_karma(20, db_session)
+    assert not settings.is_mini_karma(10, db_session)
+
+    db_session.add(IgnoredChannel(channel=20, user_id=user.id))
+    db_session.commit()
+    # Still the old settings until invalidated
+    assert not settings.is_ignored(20, db_session)
+    settings.invalidate()
+    assert settings.is_ignored(20, db_session)
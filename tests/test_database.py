@@ -0,0 +1,46 @@
+import pretend
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import utils.utils
+from cogs.database import track_user_and_karma
+from karma.blacklist import karma_blacklist
+from models import Base
+from models.karma import KarmaChange
+from models.user import User
+from tests.stubs import make_message_stub
+from utils.cache import LRUCache
+from utils.channel_settings import channel_settings
+
+AUTHOR = pretend.stub(name="Name", nick=None, id=42, mention="@Name")
+
+
+@pytest.fixture
+def session(monkeypatch):
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(utils.utils, "user_cache", LRUCache(maxsize=2))
+    channel_settings.invalidate()
+    karma_blacklist.invalidate()
+    return Session(bind=engine, future=True)
+
+
+def test_first_message_adds_the_author(session):
+    message = make_message_stub("hello", author=AUTHOR)
+    message.id = 1
+
+    assert track_user_and_karma(message, False, session) == ""
+    assert track_user_and_karma(message, False, session) == ""
+    assert [u.user_uid for u in session.query(User)] == [42]
+
+
+def test_karma_uses_the_same_session(session):
+    message = make_message_stub("apollo++", author=AUTHOR)
+    message.id = 1
+
+    reply = track_user_and_karma(message, True, session)
+
+    assert "**apollo**" in reply
+    [change] = session.query(KarmaChange).all()
+    assert change.user.user_uid == 42
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import models.models
+from models import Base, event_session
+from models.user import User
+
+pytest.importorskip("aiosqlite")
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'apollo.db'}")
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(models.models, "get_async_sessions", lambda: factory)
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    yield factory
+    asyncio.run(engine.dispose())
+
+
+def test_event_session_is_shared_within_an_event(sessions):
+    async def handle_event(uid):
+        async with event_session() as outer:
+            async with event_session() as inner:
+                assert inner is outer
+            outer.add(User(user_uid=uid, username=f"user{uid}"))
+            await outer.commit()
+        return outer
+
+    async def main():
+        # Every event (task) gets its own session
+        first, second = await asyncio.gather(handle_event(1), handle_event(2))
+        assert first is not second
+
+        async with event_session() as session:
+            assert session not in (first, second)
+            # Synchronous code can use the session too
+            users = await session.run_sync(
+                lambda s: s.scalars(select(User.username).order_by(User.user_uid)).all()
+            )
+        assert users == ["user1", "user2"]
+
+    asyncio.run(main())
@@ -1,31 +1,107 @@
 import datetime as datetime_module
 from datetime import datetime
 
-from karma.karma import is_in_cooldown
-from models.karma import KarmaChange
-
-_TIMEOUT = 60
+import pretend
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
 
+from karma.blacklist import karma_blacklist
+from karma.karma import (
+    find_karma_items,
+    is_in_cooldown,
+    process_karma,
+    topic_transformations,
+)
+from models import Base
+from models.karma import Karma, KarmaChange
+from models.user import User
+from tests.stubs import TEST_USER, make_message_stub
+from utils.channel_settings import channel_settings
 
-def build_karma_change(created_at: datetime):
-    return KarmaChange(
-        karma_id=1,
-        user_id=1,
-        message_id=1,
-        reason=None,
-        change=1,
-        score=1,
-        created_at=created_at,
-    )
+_TIMEOUT = 60
 
 
 def test_is_in_cooldown():
-    last_change = build_karma_change(datetime.utcnow())
-    assert is_in_cooldown(last_change, _TIMEOUT)
+    last_changed_at = datetime.utcnow()
+    assert is_in_cooldown(last_changed_at, _TIMEOUT)
 
 
 def test_not_is_in_cooldown():
-    last_change = build_karma_change(
-        datetime.utcnow() - datetime_module.timedelta(seconds=100)
+    last_changed_at = datetime.utcnow() - datetime_module.timedelta(seconds=100)
+    assert not is_in_cooldown(last_changed_at, _TIMEOUT)
+
+
+@pytest.fixture(scope="module")
+def database():
+    db_engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(db_engine)
+    db_session = Session(bind=db_engine, future=True)
+
+    db_session.add_all([Karma(name="Foo_Bar"), Karma(name="café"), Karma(name="cafe")])
+    db_session.commit()
+
+    return db_session
+
+
+TRANSFORMATION_CASES = {
+    "single character": ("C", ["c"]),
+    "plain word": ("foobar", ["foobar"]),
+    "space and underscore": ("Foo Bar", ["foo bar", "foo_bar"]),
+    "combining characters": ("caf\u00e9", ["caf\u00e9", "cafe\u0301", "cafe"]),
+}
+
+
+@pytest.mark.parametrize(
+    ["topic", "expected"],
+    TRANSFORMATION_CASES.values(),
+    ids=TRANSFORMATION_CASES.keys(),
+)
+def test_topic_transformations(topic, expected):
+    assert topic_transformations(topic) == expected
+
+
+LOOKUP_CASES = {
+    "exact match": ("café", "café"),
+    "different case": ("FOO_BAR", "Foo_Bar"),
+    "space instead of underscore": ("foo bar", "Foo_Bar"),
+    "not karma'd": ("foobar", None),
+}
+
+
+@pytest.mark.parametrize(
+    ["topic", "expected"], LOOKUP_CASES.values(), ids=LOOKUP_CASES.keys()
+)
+def test_find_karma_items(database, topic, expected):
+    found = find_karma_items([topic], database)
+    karma_item = next(
+        (found[t] for t in topic_transformations(topic) if t in found), None
     )
-    assert not is_in_cooldown(last_change, _TIMEOUT)
+    assert (karma_item and karma_item.name) == expected
+
+
+def test_failed_topic_does_not_discard_others():
+    db_engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(db_engine)
+    db_session = Session(bind=db_engine, future=True)
+    user = User(user_uid=TEST_USER.id, username=TEST_USER.name)
+    db_session.add(user)
+    db_session.commit()
+    channel_settings.invalidate()
+    karma_blacklist.invalidate()
+
+    @event.listens_for(db_session, "before_flush")
+    def fail_on_bar(session, flush_context, instances):
+        if any(isinstance(k, Karma) and k.name == "bar" for k in session.new):
+            raise SQLAlchemyError("bar cannot be written")
+
+    author = pretend.stub(name="Name", nick="Nick", id=TEST_USER.id, mention="@Name")
+    message = make_message_stub("foo++ bar++ baz++", author=author)
+    reply = process_karma(message, 1, db_session, _TIMEOUT, user)
+
+    assert 'Could not create "bar" due to an internal error.' in reply
+    db_session.expire_all()
+    scores = {k.name: k.score for k in db_session.query(Karma)}
+    assert scores == {"foo": 1, "baz": 1}
+    assert db_session.query(KarmaChange).count() == 2
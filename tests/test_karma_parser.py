@@ -1,8 +1,14 @@
+import random
 from textwrap import dedent
 
 import pytest
 
-from karma.parser import KarmaItem, KarmaOperation, parse_message_content
+from karma.parser import (
+    PARSER_ENGINES,
+    KarmaItem,
+    KarmaOperation,
+    parse_message_content,
+)
 
 TEST_CASES = {
     # Cases with no karma
@@ -232,3 +238,30 @@ TEST_CASES = {
 def test_parser(message, expected):
     actual = parse_message_content(message)
     assert actual == expected
+
+
+@pytest.mark.parametrize("engine", PARSER_ENGINES.keys())
+@pytest.mark.parametrize(
+    ["message", "expected"], TEST_CASES.values(), ids=TEST_CASES.keys()
+)
+def test_parser_engine(engine, message, expected):
+    actual = parse_message_content(message, engine)
+    assert actual == expected
+
+
+# Fragments that exercise the awkward corners of the grammar when randomly combined
+FUZZ_ALPHABET = [
+    *'abc +-+-"\\(),!?\n\t`é',
+    "for ",
+    "because ",
+    "x++",
+    "--",
+]
+
+
+def test_scanner_matches_parsita():
+    rng = random.Random(2000)
+    for _ in range(2000):
+        message = "".join(rng.choices(FUZZ_ALPHABET, k=rng.randint(1, 60)))
+        expected = parse_message_content(message, "parsita")
+        assert parse_message_content(message, "scanner") == expected, message
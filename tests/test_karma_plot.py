@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pretend
+from matplotlib.dates import num2date
+
+from karma.plot import (
+    changes_to_array,
+    date_axis,
+    render_karma_plot,
+    timestamps_to_dates,
+)
+
+
+def make_changes(n):
+    start = datetime(2020, 1, 1)
+    return [
+        pretend.stub(created_at=start + timedelta(hours=i), score=i) for i in range(n)
+    ]
+
+
+def test_changes_to_array():
+    array = changes_to_array(make_changes(3))
+
+    assert array.shape == (3, 2)
+    # created_at is naive UTC
+    assert array[0, 0] == 1577836800
+    assert np.array_equal(np.diff(array[:, 0]), [3600, 3600])
+    assert np.array_equal(array[:, 1], [0, 1, 2])
+
+
+def test_changes_to_array_empty():
+    assert changes_to_array([]).shape == (0, 2)
+
+
+def test_render_karma_plot():
+    png = render_karma_plot({"apollo": changes_to_array(make_changes(10))})
+    assert png.startswith(b"\x89PNG")
+
+
+def test_dates_labelled_in_uk_time():
+    # 12:00 UTC on 1 July is 13:00 BST
+    array = changes_to_array(
+        [pretend.stub(created_at=datetime(2020, 7, 1, 12), score=0)]
+    )
+    date_format, major, _ = date_axis(timedelta(hours=1))
+    date = timestamps_to_dates(array[:, 0])[0]
+
+    assert date_format(date) == "13:00 01 Jul 2020"
+    # Ticks are placed in UK time too
+    ticks = major.tick_values(num2date(date - 1 / 24), num2date(date + 1 / 24))
+    assert date_format(ticks[0]) == "12:00 01 Jul 2020"
@@ -0,0 +1,110 @@
+import asyncio
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+import pretend
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import models.models
+from cogs.commands.karma import Karma as KarmaCog
+from cogs.commands.karma import plot_cache
+from models import Base
+from models.karma import Karma, KarmaChange
+from models.user import User
+from tests.stubs import make_message_stub
+
+pytest.importorskip("aiosqlite")
+
+
+def run_now(func, *args):
+    # Rendered in the test's process rather than the pool
+    future = Future()
+    future.set_result(func(*args))
+    return future
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'apollo.db'}")
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(models.models, "get_async_sessions", lambda: factory)
+
+    async def create_topics():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with factory() as session:
+            user = User(user_uid=1, username="user")
+            rising, falling = Karma(name="rising"), Karma(name="falling")
+            # Karma'd before changes were recorded, so it has a score but no changes
+            legacy = Karma(name="legacy", pluses=10, score=10)
+            session.add_all([user, rising, falling, legacy])
+            await session.flush()
+            for topic, change in ((rising, 1), (falling, -1)):
+                for i in range(6):
+                    topic.score += change
+                    session.add(
+                        KarmaChange(
+                            karma_id=topic.id,
+                            user_id=user.id,
+                            message_id=i,
+                            created_at=datetime(2020, 7, 1) + timedelta(hours=i),
+                            reason=None,
+                            change=change,
+                            score=topic.score,
+                        )
+                    )
+            await session.commit()
+
+    async def wait_until_ready():
+        pass
+
+    asyncio.run(create_topics())
+    plot_cache.clear()
+    parallelism = pretend.stub(execute_on_process=run_now)
+    yield pretend.stub(
+        wait_until_ready=wait_until_ready, get_cog=lambda name: parallelism
+    )
+    asyncio.run(engine.dispose())
+
+
+def plot(bot, topic):
+    sent = []
+
+    async def send(content, **kwargs):
+        sent.append((content, kwargs))
+
+    async def typing():
+        pass
+
+    author = pretend.stub(name="Name", nick=None, id=1, mention="@Name")
+    ctx = pretend.stub(
+        message=make_message_stub(f"!karma plot {topic}", author=author),
+        guild=None,
+        send=send,
+        typing=typing,
+    )
+    asyncio.run(KarmaCog(bot).common_plot(ctx, topic, False))
+    return sent
+
+
+@pytest.mark.parametrize(
+    ["topic", "emoji"],
+    [
+        ("rising", ":chart_with_upwards_trend:"),
+        ("falling", ":chart_with_downwards_trend:"),
+    ],
+)
+def test_common_plot_sends_the_plot(bot, topic, emoji):
+    [(content, kwargs)] = plot(bot, topic)
+    assert content == f"Here you go, @Name! {emoji}"
+    assert kwargs["embed"].title == f'Karma trend over time for "{topic}"'
+    assert kwargs["file"].fp.read().startswith(b"\x89PNG")
+
+
+def test_common_plot_needs_enough_changes(bot):
+    [(content, _)] = plot(bot, "legacy")
+    assert content == (
+        "Could not plot the following item(s):\nlegacy: must have been karma'd at "
+        "least 5 times before a plot can be made (currently karma'd 0 time)"
+    )
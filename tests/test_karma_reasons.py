@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from karma.reasons import fetch_reasons_page
+from models import Base
+from models.karma import Karma, KarmaChange
+from models.user import User
+
+
+def test_fetch_reasons_page():
+    db_engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(db_engine)
+    db_session = Session(bind=db_engine, future=True)
+
+    user = User(user_uid=100, username="alice")
+    topic = Karma(name="apollo")
+    db_session.add_all([user, topic])
+    db_session.flush()
+
+    # Two changes share a time, so the message ID has to break the tie, and every
+    # third change has no reason
+    db_session.add_all(
+        KarmaChange(
+            karma_id=topic.id,
+            user_id=user.id,
+            message_id=i,
+            created_at=datetime(2024, 1, 1 + i // 2),
+            reason=None if i % 3 == 0 else f"reason {i}",
+            change=1,
+            score=i,
+        )
+        for i in range(1, 11)
+    )
+    db_session.commit()
+
+    first = fetch_reasons_page(topic.id, db_session, size=3)
+    assert first.reasons == [("reason 1", 1), ("reason 2", 1), ("reason 4", 1)]
+    assert not first.has_previous and first.has_next
+
+    second = fetch_reasons_page(topic.id, db_session, after=first.last, size=3)
+    assert [r for r, _ in second.reasons] == ["reason 5", "reason 7", "reason 8"]
+    assert second.has_previous and second.has_next
+
+    back = fetch_reasons_page(topic.id, db_session, before=second.first, size=3)
+    assert back.reasons == first.reasons
+    assert not back.has_previous and back.has_next
+
+    last = fetch_reasons_page(topic.id, db_session, after=second.last, size=3)
+    assert last.reasons == [("reason 10", 1)]
+    assert last.has_previous and not last.has_next
+
+
+def test_fetch_reasons_page_empty():
+    db_engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(db_engine)
+    db_session = Session(bind=db_engine, future=True)
+
+    page = fetch_reasons_page(1, db_session)
+    assert page.reasons == [] and page.first is None and page.last is None
+    assert not page.has_previous and not page.has_next
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from karma.stats import KarmaStats, get_karma_stats
+from models import Base
+from models.karma import Karma, KarmaChange
+from models.user import User
+from utils.cache import LRUCache
+
+
+def test_karma_stats():
+    db_engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(db_engine)
+    db_session = Session(bind=db_engine, future=True)
+
+    alice, bob = (
+        User(user_uid=100, username="alice"),
+        User(user_uid=200, username="bob"),
+    )
+    topic = Karma(name="apollo")
+    db_session.add_all([alice, bob, topic])
+    db_session.flush()
+
+    def change(user, message_id, day):
+        return KarmaChange(
+            karma_id=topic.id,
+            user_id=user.id,
+            message_id=message_id,
+            created_at=datetime(2024, 1, day),
+            reason=None,
+            change=1,
+            score=message_id,
+        )
+
+    # bob and alice tie, but bob was first
+    db_session.add_all([change(bob, 1, 1), change(alice, 2, 2), change(alice, 3, 3)])
+    db_session.add_all([change(bob, 4, 4)])
+    topic.last_changed_at = datetime(2024, 1, 4)
+    db_session.commit()
+
+    expected = KarmaStats(
+        changes=4,
+        users=2,
+        top_user_uid=200,
+        top_user_changes=2,
+        first_change=datetime(2024, 1, 1),
+        last_change=datetime(2024, 1, 4),
+    )
+    assert get_karma_stats(topic, db_session) == expected
+
+    # Cached until the topic changes again
+    db_session.add(change(alice, 5, 5))
+    db_session.commit()
+    assert get_karma_stats(topic, db_session) == expected
+    topic.last_changed_at = datetime(2024, 1, 5)
+    assert get_karma_stats(topic, db_session).top_user_uid == 100
+
+
+def test_karma_stats_no_changes(monkeypatch):
+    # Other tests' topics are cached under the same ID
+    monkeypatch.setattr("karma.stats._stats_cache", LRUCache(128))
+    db_engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(db_engine)
+    db_session = Session(bind=db_engine, future=True)
+
+    topic = Karma(name="apollo")
+    db_session.add(topic)
+    db_session.commit()
+
+    assert get_karma_stats(topic, db_session) == KarmaStats(
+        changes=0,
+        users=0,
+        top_user_uid=None,
+        top_user_changes=0,
+        first_change=None,
+        last_change=None,
+    )
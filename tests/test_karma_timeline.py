@@ -0,0 +1,70 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from karma.timeline import get_karma_timeline
+from models import Base
+from models.karma import Karma, KarmaChange
+from models.user import User
+
+CHANGES = 2000
+
+
+@pytest.fixture(scope="module")
+def topic():
+    db_engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(db_engine)
+    db_session = Session(bind=db_engine, future=True)
+
+    user = User(user_uid=1, username="user")
+    topic = Karma(name="apollo")
+    db_session.add_all([user, topic])
+    db_session.flush()
+
+    rng = random.Random(0)
+    score = 0
+    time = datetime(2020, 1, 1)
+    for message_id in range(CHANGES):
+        change = rng.choice([-1, 1])
+        score += change
+        time += timedelta(minutes=rng.randint(1, 600))
+        db_session.add(
+            KarmaChange(
+                karma_id=topic.id,
+                user_id=user.id,
+                message_id=message_id,
+                created_at=time,
+                reason=None,
+                change=change,
+                score=score,
+            )
+        )
+    topic.last_changed_at = time
+    db_session.commit()
+
+    return topic, db_session
+
+
+def test_short_timeline_is_complete(topic):
+    topic, db_session = topic
+    timeline = get_karma_timeline(topic, db_session, buckets=CHANGES)
+
+    assert timeline.shape == (CHANGES, 2)
+
+
+def test_long_timeline_is_downsampled(topic):
+    topic, db_session = topic
+    full = get_karma_timeline(topic, db_session, buckets=CHANGES)
+    timeline = get_karma_timeline(topic, db_session, buckets=50)
+
+    # Bucketing can add one bucket at the end, for the very last change
+    assert len(timeline) <= 4 * 51
+    assert (timeline[:, 0] == sorted(timeline[:, 0])).all()
+    # The ends and the extremes are always kept
+    assert (timeline[0] == full[0]).all()
+    assert (timeline[-1] == full[-1]).all()
+    assert timeline[:, 1].min() == full[:, 1].min()
+    assert timeline[:, 1].max() == full[:, 1].max()
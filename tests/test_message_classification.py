@@ -0,0 +1,29 @@
+import pytest
+
+from utils.message_classification import MessageClassification, classify_content
+
+PREFIXES = ("!", "<@1234> ")
+
+TEST_CASES = {
+    "plain": ("hello world", MessageClassification(False, False, False, False)),
+    "command": ("!karma top", MessageClassification(True, False, False, False)),
+    "mention command": (
+        "<@1234> roll 1d6",
+        MessageClassification(True, False, False, False),
+    ),
+    "karma": ("apollo++", MessageClassification(False, True, False, False)),
+    "neutral karma": ("apollo+-", MessageClassification(False, True, False, False)),
+    "link": (
+        "look https://x.com/foo",
+        MessageClassification(False, False, True, False),
+    ),
+    "thanks": ("Thank you apollo", MessageClassification(False, False, False, True)),
+    "thanks inside word": ("typing", MessageClassification(False, False, False, False)),
+}
+
+
+@pytest.mark.parametrize(
+    ["content", "expected"], TEST_CASES.values(), ids=TEST_CASES.keys()
+)
+def test_classify_content(content, expected):
+    assert classify_content(content, PREFIXES) == expected
@@ -0,0 +1,77 @@
+import asyncio
+
+import pretend
+import pytest
+from discord.ext.commands import Cog
+
+from cogs.message_dispatch import MessageDispatch, irc_content, message_handler
+from tests.stubs import make_irc_message_stub, make_message_stub
+
+IRC_CASES = {
+    "plain": ("hello", "hello"),
+    "command": ("!karma top", "!karma top"),
+    "nick-like content": ("**<a>** b", "**<a>** b"),
+}
+
+
+@pytest.mark.parametrize(
+    ["content", "expected"], IRC_CASES.values(), ids=IRC_CASES.keys()
+)
+def test_irc_content(content, expected):
+    assert irc_content(make_irc_message_stub(content)) == expected
+
+
+class Recorder(Cog):
+    def __init__(self):
+        self.seen = []
+
+    @message_handler(order=20)
+    async def second(self, ctx):
+        self.seen.append("second")
+
+    @message_handler(order=10)
+    async def first(self, ctx):
+        self.seen.append("first")
+        raise ValueError("handlers after this one should still run")
+
+    async def not_a_handler(self, ctx):
+        self.seen.append("not a handler")
+
+
+def test_dispatch_order():
+    recorder = Recorder()
+    bot = pretend.stub(cogs={"Recorder": recorder})
+    dispatch = MessageDispatch(bot)
+    dispatch.build_context = lambda message: pretend.stub(message=message, stop=False)
+
+    asyncio.run(dispatch.on_message(make_message_stub("hello")))
+
+    assert recorder.seen == ["first", "second"]
+    assert dispatch.timings["Recorder.first"].calls == 1
+    assert dispatch.timings["Recorder.second"].calls == 1
+
+
+class Stopper(Cog):
+    def __init__(self):
+        self.seen = []
+
+    @message_handler(order=10)
+    async def first(self, ctx):
+        self.seen.append("first")
+        ctx.stop = True
+
+    @message_handler(order=20)
+    async def second(self, ctx):
+        self.seen.append("second")
+
+
+def test_dispatch_stop():
+    stopper = Stopper()
+    bot = pretend.stub(cogs={"Stopper": stopper})
+    dispatch = MessageDispatch(bot)
+    dispatch.build_context = lambda message: pretend.stub(message=message, stop=False)
+
+    asyncio.run(dispatch.on_message(make_message_stub("hello")))
+
+    assert stopper.seen == ["first"]
+    assert "Stopper.second" not in dispatch.timings
@@ -0,0 +1,29 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from models.pool import pool_stats, track_checkouts
+
+
+def test_pool_stats(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'apollo.db'}",
+        poolclass=QueuePool,
+        pool_size=1,
+        max_overflow=1,
+    )
+    track_checkouts(engine)
+
+    with engine.connect() as first, engine.connect() as second:
+        first.execute(text("SELECT 1"))
+        second.execute(text("SELECT 1"))
+        assert pool_stats(engine).startswith("2 of 1 checked out (1 overflow),")
+
+    assert pool_stats(engine) == (
+        "0 of 1 checked out (0 overflow), 2 checkouts with 1 in overflow"
+        " and at most 2 checked out at once"
+    )
+
+
+def test_pool_stats_untracked(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'apollo.db'}")
+    assert pool_stats(engine) == engine.pool.status()
@@ -0,0 +1,32 @@
+import logging
+
+from sqlalchemy import create_engine, text
+
+from config import CONFIG
+from utils.query_stats import instrument_engine, track_queries
+
+
+def test_track_queries(monkeypatch, caplog):
+    engine = create_engine("sqlite:///:memory:")
+    instrument_engine(engine)
+    monkeypatch.setattr(CONFIG, "SLOW_EVENT_QUERIES", 2)
+    monkeypatch.setattr(CONFIG, "SLOW_EVENT_DB_TIME", 60)
+
+    with engine.connect() as conn:
+        # Queries outside of any event aren't counted anywhere
+        conn.execute(text("SELECT 1"))
+
+        with track_queries("outer") as outer:
+            conn.execute(text("SELECT 1"))
+            with track_queries("inner") as inner:
+                conn.execute(text("SELECT 1"))
+                conn.execute(text("SELECT 1"))
+
+    assert inner.queries == 2
+    assert outer.queries == 3
+    assert outer.duration >= inner.duration > 0
+
+    # Only the outer event went over the threshold
+    warnings = [r for r in caplog.records if r.levelno == logging.WARNING]
+    assert [r.event for r in warnings] == ["outer"]
+    assert warnings[0].queries == 3
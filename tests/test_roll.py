@@ -2,7 +2,7 @@ import pytest
 from parsita import ParseError
 
 import roll.exceptions as rollerr
-from roll.parser import parse_program
+from roll.parser import parse_program, parse_program_cached
 
 SIMPLE_TEST_CASES = [
     #  Literals
@@ -109,6 +109,8 @@ SIMPLE_ND_TEST_CASES = [
     (r"1d(1d(1d(1d(1d(1d1000)))))", range(1, 1001)),
     (r"(1d3)d1", range(1, 4)),
     (r"(2d6)d(1d20)", range(2, 241)),
+    (r"5000d6", range(5000, 30001)),
+    (r"3d(2^40)", range(3, 3 * 2**40 + 1)),
 ]
 
 FUNCTION_TEST_CASES = [
@@ -144,7 +146,8 @@ ERROR_TEST_CASES = [
     (r"(-1)d10", rollerr.NegativeDiceCountError),
     (r"2d(-4)", rollerr.NegativeDiceSidesError),
     (r"1$(2->1)", rollerr.CaseFailureError),
-    (r"1/0", rollerr.ZeroDivisionError)
+    (r"1/0", rollerr.ZeroDivisionError),
+    (r"1000001d6", rollerr.ExcessiveDiceRollsError)
     # (r"^x=x$x", Loop)
     # (r"^x=x$1", ???)
     # (r"^x=y;y=x$x+y", Loop)
@@ -171,7 +174,49 @@ def test_roll_functions(string, expected):
     assert actual == expected
 
 
+@pytest.mark.parametrize(["string", "expected"], FUNCTION_TEST_CASES)
+def test_roll_cached_programs(string, expected):
+    # The cached program is shared, so it has to give the same answer when evaluated again
+    first = parse_program_cached(string)
+    second = parse_program_cached(f"  {string} ")
+    assert first is second
+    assert first.reduce()[0].pure == expected
+    assert second.reduce()[0].pure == expected
+
+
+def test_roll_cached_long_programs():
+    # Anything that can be parsed can be evaluated from the cache
+    string = "1+" * 300 + "1"
+    assert parse_program_cached(string).reduce()[0].pure == 301
+    assert parse_program_cached(string).reduce()[0].pure == 301
+
+
 @pytest.mark.parametrize(["string", "error"], ERROR_TEST_CASES)
 def test_roll_errors(string, error):
     with pytest.raises(error):
         parse_program(string).reduce()
+
+
+TRACE_TEST_CASES = [
+    (r"1 ; 2 ; (3+(1d0))", ["1d0", "3+1d0"]),
+    (r"^x=0$y", ["y", "^x=0$y"]),
+    (
+        r"@f = \x -> x ? 1+(f x-1) : 1/0 ; 1+2*(f 3)",
+        [
+            "1/0",
+            "x?(1+f (x-1)):(1/0)",
+            "^x=(x-1)$x?(1+f (x-1)):(1/0)",
+            "...",
+            "2*f 3",
+            "1+(2*f 3)",
+        ],
+    ),
+]
+
+
+@pytest.mark.parametrize(["string", "trace"], TRACE_TEST_CASES)
+def test_roll_error_traces(string, trace):
+    with pytest.raises(rollerr.RunTimeError) as error:
+        parse_program(string).reduce()
+    expected = "Exception in\n    " + "\nin\n    ".join(trace)
+    assert str(error.value).endswith(expected)
@@ -0,0 +1,84 @@
+import pytest
+
+import roll.exceptions as rollerr
+from roll.distribution import DistributionBuilder, program_distribution
+from roll.parser import parse_program
+
+
+def test_distribution_of_two_dice():
+    dist = program_distribution(parse_program(r"2d6"))
+    assert list(dist.outcomes) == list(range(2, 13))
+    ways = [1, 2, 3, 4, 5, 6, 5, 4, 3, 2, 1]
+    assert list(dist.probabilities) == pytest.approx([w / 36 for w in ways])
+
+
+DISTRIBUTION_TEST_CASES = [
+    # (expression, mean, variance)
+    (r"2d6", 7, 35 / 6),
+    (r"4d6+2", 16, 35 / 3),
+    (r"1d6*2-1", 6, 35 / 3),
+    (r"(1d2)d2", 2.25, 0.9375),
+    (r"(1d2 == 1) ? 1d4 : 10", 6.25, 14.6875),
+    (r"1d6 > 3", 0.5, 0.25),
+    (r"1d6 & 2.5", 2, 0),
+    (r"1d6 - 1d6", 0, 35 / 6),
+    (r"100d6", 350, 3500 / 12),
+    (r"1d1 + 5d1", 6, 0),
+]
+
+
+@pytest.mark.parametrize(["string", "mean", "variance"], DISTRIBUTION_TEST_CASES)
+def test_distribution(string, mean, variance):
+    dist = program_distribution(parse_program(string))
+    assert dist.probabilities.sum() == pytest.approx(1)
+    assert dist.mean == pytest.approx(mean)
+    assert dist.variance == pytest.approx(variance)
+
+
+def test_distribution_memoises_sub_expressions():
+    builder = DistributionBuilder()
+    program = parse_program(r"1d6 + 1d6 * 1d6")
+    builder.of(program.expressions[0])
+    assert sorted(builder.memo) == ["(1d6*1d6)", "(1d6+(1d6*1d6))", "1", "1d6", "6"]
+
+
+def test_distribution_ignores_branches_never_taken():
+    dist = program_distribution(parse_program(r"1 ? 2d6 : 1d0"))
+    assert dist.mean == pytest.approx(7)
+
+
+DISTRIBUTION_ERROR_TEST_CASES = [
+    (r"1/0", rollerr.ZeroDivisionError),
+    (r"10/(1d2-1)", rollerr.ZeroDivisionError),
+    (r"(1d2-1)d6", rollerr.ZeroDiceCountError),
+    (r"1d(1d2-0.5)", rollerr.FloatingPointDiceSidesError),
+    (r"1000001d6", rollerr.ExcessiveDiceRollsError),
+    (r"1d(10^6)", rollerr.DistributionError),
+    (r"2^60+1d2", rollerr.DistributionError),
+    (r"9007199254740993+1d2", rollerr.DistributionError),
+    ("1+" * 300 + "1d2", rollerr.DistributionError),
+    (r"(1d100)d(1d100)", rollerr.DistributionError),
+    (r"x", rollerr.DistributionError),
+    (r"'foo'", rollerr.DistributionError),
+    (r"^x=1d6$x", rollerr.DistributionError),
+    (r"@f=1d6;f", rollerr.DistributionError),
+]
+
+
+@pytest.mark.parametrize(["string", "error"], DISTRIBUTION_ERROR_TEST_CASES)
+def test_distribution_errors(string, error):
+    with pytest.raises(error):
+        program_distribution(parse_program(string))
+
+
+# Every roll of these fails, so evaluating them once always raises the error
+ALWAYS_FAILING = [r"1 + (1d0 ? 1 : 2)", r"2 * (3 / (1d1 - 1))", r"(1d6 > 0) ? 1d0 : 2"]
+
+
+@pytest.mark.parametrize("string", ALWAYS_FAILING)
+def test_distribution_errors_match_evaluation(string):
+    with pytest.raises(rollerr.RunTimeError) as evaluated:
+        parse_program(string).reduce()
+    with pytest.raises(rollerr.RunTimeError) as distributed:
+        program_distribution(parse_program(string))
+    assert str(distributed.value) == str(evaluated.value)
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+import roll.exceptions as rollerr
+from roll.ast import roll_dice
+from roll.parser import parse_program
+from roll.stats import (
+    BATCH_SAMPLES,
+    SLOW_SAMPLES,
+    Summary,
+    render_histogram,
+    sample_program,
+)
+
+
+def test_roll_dice():
+    counts = np.array([1, 3, 1000, 2])
+    sides = np.array([6, 1, 20, 2**32])
+    totals = roll_dice(counts, sides)
+    assert totals.shape == (4,)
+    assert np.all(totals >= counts)
+    assert np.all(totals <= counts * sides)
+    assert totals[1] == 3
+
+
+STATS_TEST_CASES = [
+    # (expression, mean, variance)
+    (r"2d6", 7, 35 / 6),
+    (r"4d6+2", 16, 35 / 3),
+    (r"1d6*2-1", 6, 35 / 3),
+    (r"(1d2)d2", 2.25, 0.9375),
+    (r"(1d2 == 1) ? 1d4 : 10", 6.25, 14.6875),
+    (r"1d6 > 3", 0.5, 0.25),
+    (r"1d6 & 2.5", 2, 0),
+]
+
+
+@pytest.mark.parametrize(["string", "mean", "variance"], STATS_TEST_CASES)
+def test_stats_batched(string, mean, variance):
+    values = sample_program(parse_program(string))
+    assert len(values) == BATCH_SAMPLES
+    summary = Summary.of(values)
+    assert summary.mean == pytest.approx(mean, abs=0.1)
+    assert summary.variance == pytest.approx(variance, abs=0.2)
+
+
+@pytest.mark.parametrize("string", [r"2^60+1d2", r"1152921504606846977+1d2"])
+def test_stats_beyond_float_precision(string):
+    # Floats can't tell these apart, so they're evaluated rather than batched
+    values = sample_program(parse_program(string))
+    assert len(values) == SLOW_SAMPLES
+    summary = Summary.of(values)
+    assert summary.variance == pytest.approx(0.25, abs=0.05)
+    assert summary.maximum - summary.minimum == 1
+    assert render_histogram(values, string).startswith(b"\x89PNG")
+
+
+def test_stats_evaluates_what_cannot_be_batched():
+    values = sample_program(parse_program(r"^x=1d6$x+1"))
+    assert len(values) == SLOW_SAMPLES
+    assert set(values) <= {2, 3, 4, 5, 6, 7}
+
+
+STATS_ERROR_TEST_CASES = [
+    (r"1/0", rollerr.ZeroDivisionError),
+    (r"10/(1d2-1)", rollerr.ZeroDivisionError),
+    (r"1d0", rollerr.ZeroDiceSidesError),
+    (r"'foo'", rollerr.StatisticsError),
+    (r"1d6 ; 2d6", rollerr.StatisticsError),
+]
+
+
+@pytest.mark.parametrize(["string", "error"], STATS_ERROR_TEST_CASES)
+def test_stats_errors(string, error):
+    with pytest.raises(error):
+        sample_program(parse_program(string))
+
+
+@pytest.mark.parametrize("string", [r"2d6", r"1d6/7"])
+def test_render_histogram(string):
+    values = sample_program(parse_program(string))
+    assert render_histogram(values, string).startswith(b"\x89PNG")
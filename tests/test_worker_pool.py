@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.worker_pool import WorkerPool
+
+
+def double(x):
+    return 2 * x
+
+
+def fail():
+    raise ValueError("from the worker")
+
+
+def hang():
+    # Never set, so only being killed ends the job
+    threading.Event().wait()
+
+
+async def until(condition):
+    """Let the event loop run until condition holds, without depending on timing"""
+    for _ in range(1000):
+        if condition():
+            return
+        await asyncio.sleep(0)
+    pytest.fail("the pool never reached the expected state")
+
+
+def test_worker_pool():
+    async def main():
+        pool = WorkerPool(1)
+        pool.start()
+        try:
+            assert await pool.run(5, double, 21) == 42
+            with pytest.raises(ValueError, match="from the worker"):
+                await pool.run(5, fail)
+            assert (pool.idle, pool.kills) == (1, 0)
+        finally:
+            pool.shutdown()
+
+    asyncio.run(main())
+
+
+def test_worker_pool_kills_runaway_jobs():
+    async def main():
+        pool = WorkerPool(1)
+        pool.start()
+        try:
+            hung = asyncio.create_task(pool.run(0.5, hang))
+            await until(lambda: pool.idle == 0)
+            queued = asyncio.create_task(pool.run(30, double, 1))
+            await until(lambda: pool.queue_depth == 1)
+
+            # The runaway job's worker is killed and replaced, then runs the next job
+            with pytest.raises(asyncio.TimeoutError):
+                await hung
+            assert pool.kills == 1
+            assert await queued == 2
+            assert (pool.idle, pool.queue_depth) == (1, 0)
+        finally:
+            pool.shutdown()
+
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, Set, Tuple, TypeVar
+
+from sqlalchemy.orm import Session
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """A bounded least-recently-used cache, with optional expiry after ttl seconds.
+
+    Unlike functools.lru_cache, entries can be invalidated individually, and hits and
+    misses are counted per instance.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[K, Tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: K, now: float) -> Optional[Tuple[float, V]]:
+        entry = self._entries.get(key)
+        if entry is not None and (self.ttl is None or now - entry[0] < self.ttl):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def get(self, key: K) -> Optional[V]:
+        """Get a cached value, or None if it isn't cached (so don't cache None)"""
+        entry = self._lookup(key, time.monotonic())
+        return None if entry is None else entry[1]
+
+    def get_or_load(self, key: K, load: Callable[[K], V]) -> V:
+        now = time.monotonic()
+        entry = self._lookup(key, now)
+        if entry is not None:
+            return entry[1]
+
+        value = load(key)
+        self.put(key, value, now)
+        return value
+
+    def put(self, key: K, value: V, now: Optional[float] = None):
+        self._entries[key] = (time.monotonic() if now is None else now, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: K):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class CachedSet(Generic[K]):
+    """An in-memory copy of a small table, so that lookups don't touch the database.
+
+    Whatever changes the table must call invalidate after writing, so that the next
+    lookup reloads it.
+    """
+
+    def __init__(self, query: Callable[[Session], Set[K]]):
+        self._query = query
+        self._values: Optional[Set[K]] = None
+
+    def load(self, db_session: Session):
+        self._values = self._query(db_session)
+
+    def invalidate(self):
+        self._values = None
+
+    def get(self, db_session: Session) -> Set[K]:
+        if self._values is None:
+            self.load(db_session)
+        return self._values or set()
@@ -0,0 +1,39 @@
+from sqlalchemy.orm import Session
+
+from models.channel_settings import IgnoredChannel, MiniKarmaChannel
+from utils.cache import CachedSet
+
+
+class ChannelSettings:
+    """In-memory copy of the ignored and mini-karma channels.
+
+    Both only change through the admin cog, which calls invalidate.
+    """
+
+    def __init__(self):
+        self._ignored = CachedSet(
+            lambda db_session: {c for (c,) in db_session.query(IgnoredChannel.channel)}
+        )
+        self._mini_karma = CachedSet(
+            lambda db_session: {
+                c for (c,) in db_session.query(MiniKarmaChannel.channel)
+            }
+        )
+
+    def load(self, db_session: Session):
+        self._ignored.load(db_session)
+        self._mini_karma.load(db_session)
+
+    def invalidate(self):
+        self._ignored.invalidate()
+        self._mini_karma.invalidate()
+
+    def is_ignored(self, channel_id: int, db_session: Session) -> bool:
+        return channel_id in self._ignored.get(db_session)
+
+    def is_mini_karma(self, channel_id: int, db_session: Session) -> bool:
+        return channel_id in self._mini_karma.get(db_session)
+
+
+# Shared by the global command check and karma processing
+channel_settings = ChannelSettings()
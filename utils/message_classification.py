@@ -0,0 +1,48 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+import discord
+from discord.ext.commands import Bot
+
+KARMA_OPERATOR = re.compile(r"\+\+|--|\+\-")
+THANKS = re.compile(r"\b(?:thx|thanks|thank you|ty)\b")
+
+# Links to sites with broken embeds, and the mirror to reply with instead
+LINK_REWRITES = [
+    (re.compile(r"https?://(twitter\.com|x\.com)"), "https://fxtwitter.com"),
+    (re.compile(r"https?://(?:old\.|www\.)?reddit\.com"), "https://rxddit.com"),
+    (re.compile(r"https?://www\.instagram\.com"), "https://uuinstagram.com"),
+]
+
+
+@dataclass(frozen=True)
+class MessageClassification:
+    """What on_message listeners might be interested in, worked out once per message"""
+
+    is_command: bool
+    has_karma_operator: bool
+    has_rewritable_link: bool
+    has_thanks: bool
+
+
+@lru_cache(maxsize=256)
+def classify_content(
+    content: str, command_prefixes: tuple[str, ...]
+) -> MessageClassification:
+    return MessageClassification(
+        is_command=content.startswith(command_prefixes),
+        has_karma_operator=KARMA_OPERATOR.search(content) is not None,
+        has_rewritable_link=any(p.search(content) for p, _ in LINK_REWRITES),
+        has_thanks=THANKS.search(content.lower()) is not None,
+    )
+
+
+def classify_message(bot: Bot, message: discord.Message) -> MessageClassification:
+    """Classify a message, sharing the result between every listener that asks
+
+    The classification is cached on the content, so a message rewritten by the IRC
+    bridge is classified again.
+    """
+    command_prefixes = bot.command_prefix(bot, message)  # type: ignore
+    return classify_content(message.content, tuple(command_prefixes))  # type: ignore
@@ -0,0 +1,91 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+from config import CONFIG
+
+
+@dataclass
+class QueryStats:
+    """The SQL run while handling one event or command"""
+
+    name: str
+    parent: Optional["QueryStats"] = None
+    queries: int = 0
+    # Seconds spent waiting on the database
+    duration: float = 0
+
+
+# Each event is handled in its own task, which gets its own copy of this
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def _before_cursor_execute(conn: Connection, *_: Any):
+    starts: List[float] = conn.info.setdefault("query_starts", [])
+    starts.append(time.perf_counter())
+
+
+def _after_cursor_execute(conn: Connection, *_: Any):
+    elapsed = time.perf_counter() - conn.info["query_starts"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.duration += elapsed
+
+
+def instrument_engine(engine: Engine):
+    """Count the queries an engine runs towards whichever event is being tracked"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def start_tracking(name: str) -> QueryStats:
+    """Attribute queries to a new event until finish_tracking, nested in any current one"""
+    stats = QueryStats(name, parent=_current.get())
+    _current.set(stats)
+    return stats
+
+
+def finish_tracking() -> Optional[QueryStats]:
+    """Stop tracking the current event, warning if it used the database too much"""
+    stats = _current.get()
+    if stats is None:
+        return None
+    _current.set(stats.parent)
+    if stats.parent is not None:
+        stats.parent.queries += stats.queries
+        stats.parent.duration += stats.duration
+
+    if (
+        stats.queries > CONFIG.SLOW_EVENT_QUERIES
+        or stats.duration > CONFIG.SLOW_EVENT_DB_TIME
+    ):
+        logging.warning(
+            "Heavy database use: event=%r queries=%d db_time_ms=%.1f",
+            stats.name,
+            stats.queries,
+            1000 * stats.duration,
+            extra={
+                "event": stats.name,
+                "queries": stats.queries,
+                "db_time": stats.duration,
+            },
+        )
+    return stats
+
+
+@contextmanager
+def track_queries(name: str) -> Iterator[QueryStats]:
+    stats = start_tracking(name)
+    try:
+        yield stats
+    finally:
+        # Finish anything nested that didn't finish itself, then this
+        while (current := _current.get()) is not None and current is not stats.parent:
+            finish_tracking()
@@ -6,18 +6,32 @@ import textwrap
 from datetime import datetime, timedelta
 from decimal import Decimal, InvalidOperation
 from io import BytesIO
-from typing import Any, Callable, Coroutine, Iterable, ParamSpec, Tuple, TypeAlias
+from typing import (
+    Any,
+    Callable,
+    Coroutine,
+    Iterable,
+    ParamSpec,
+    Sized,
+    Tuple,
+    TypeAlias,
+)
 
 import aiohttp
 import dateparser
 import discord
 from discord.ext.commands import Bot, Context
 from pytz import timezone, utc
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy_utils import ScalarListException
 
 from config import CONFIG
 from models import db_session
 from models.user import User
 
+from .cache import LRUCache
 from .typing import Identifiable
 
 
@@ -67,14 +81,51 @@ def format_list_of_members(members: Iterable[discord.Member], /, *, ping: bool =
     return format_list(el)
 
 
+# Discord user ID to primary key, None is cached for users not in the database
+# Users themselves aren't cached, as every commit expires them
+user_cache: LRUCache[int, int | None] = LRUCache(
+    CONFIG.USER_CACHE_SIZE, CONFIG.USER_CACHE_TTL
+)
+
+
+def invalidate_database_user(id_: int, /):
+    """Must be called whenever a user is added to the database"""
+    user_cache.invalidate(id_)
+
+
+def get_database_user_id(id_: int, session: Session | None = None, /) -> int | None:
+    """The user's primary key, looked up in session (or db_session) if it isn't cached"""
+    if session is None:
+        session = db_session
+    return user_cache.get_or_load(
+        id_, lambda uid: session.scalar(select(User.id).where(User.user_uid == uid))
+    )
+
+
 def get_database_user_from_id(id_: int, /) -> User | None:
-    return db_session.query(User).filter(User.user_uid == id_).one_or_none()
+    pk = get_database_user_id(id_)
+    # Doesn't query unless the user isn't in the session yet, or has expired
+    return None if pk is None else db_session.get(User, pk)
 
 
 def get_database_user(user: Identifiable, /) -> User | None:
     return get_database_user_from_id(user.id)
 
 
+def add_database_user(user: discord.abc.User, session: Session, /) -> int | None:
+    """Add a user seen for the first time, returning their primary key or None on failure"""
+    db_user = User(user_uid=user.id, username=str(user))
+    session.add(db_user)
+    try:
+        session.commit()
+    except (ScalarListException, SQLAlchemyError) as e:
+        session.rollback()
+        logging.exception(e)
+        return None
+    invalidate_database_user(user.id)
+    return db_user.id
+
+
 def get_name_string(message: discord.Message):
     # if message.clean_content.startswith("**<"): <-- FOR TESTING
     if user_is_irc_bot(message):
@@ -184,8 +235,9 @@ def parse_time(time: str, /):
     return parsed_time
 
 
-def pluralise(el: list[Any], /, word: str, single: str = "", plural: str = "s"):
-    if len(el) > 1:
+def pluralise(el: Sized | int, /, word: str, single: str = "", plural: str = "s"):
+    count = el if isinstance(el, int) else len(el)
+    if count > 1:
         return word + plural
     else:
         return word + single
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def _serve(conn: Connection, initializer: Optional[Callable[[], None]]):
+    """The loop run by each worker process, running one job at a time"""
+    if initializer is not None:
+        initializer()
+    while True:
+        try:
+            func, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send((True, func(*args)))
+        except Exception as e:
+            try:
+                conn.send((False, e))
+            except Exception:
+                # The exception couldn't be pickled
+                conn.send((False, RuntimeError(repr(e))))
+
+
+class Worker:
+    def __init__(self, initializer: Optional[Callable[[], None]]):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process: BaseProcess = multiprocessing.Process(
+            target=_serve, args=(child_conn, initializer), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """A fixed number of worker processes, started up front, that run one job each.
+
+    Unlike ProcessPoolExecutor, a job that runs past its deadline has its worker killed
+    and replaced, so a few runaway jobs can't tie up the pool for everyone else.
+    """
+
+    def __init__(self, size: int, initializer: Optional[Callable[[], None]] = None):
+        self.size = size
+        self.initializer = initializer
+        # Jobs waiting for a worker to be free
+        self.queue_depth = 0
+        # Workers killed for running past their deadline, or dying some other way
+        self.kills = 0
+        self._workers: List[Worker] = []
+        self._idle: asyncio.Queue[Worker] = asyncio.Queue()
+
+    @property
+    def idle(self) -> int:
+        """Workers waiting for a job"""
+        return self._idle.qsize()
+
+    def start(self):
+        for _ in range(self.size):
+            self._add_worker()
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.kill()
+        self._workers = []
+        self._idle = asyncio.Queue()
+
+    def _add_worker(self):
+        worker = Worker(self.initializer)
+        self._workers.append(worker)
+        self._idle.put_nowait(worker)
+
+    def _replace(self, worker: Worker):
+        self.kills += 1
+        worker.kill()
+        self._workers.remove(worker)
+        self._add_worker()
+
+    async def run(self, timeout: float, func: Callable[..., T], /, *args: Any) -> T:
+        """Run a picklable function in a worker, raising TimeoutError after timeout seconds
+
+        The timeout includes any time spent waiting for a worker.
+        """
+        deadline = time.monotonic() + timeout
+        self.queue_depth += 1
+        try:
+            worker = await asyncio.wait_for(self._idle.get(), timeout)
+        finally:
+            self.queue_depth -= 1
+
+        try:
+            worker.conn.send((func, args))
+            ok, result = await asyncio.wait_for(
+                self._receive(worker.conn), deadline - time.monotonic()
+            )
+        except BaseException:
+            # Timed out, cancelled or the worker died, either way it can't be reused
+            self._replace(worker)
+            raise
+        self._idle.put_nowait(worker)
+
+        if not ok:
+            raise result
+        return result
+
+    @staticmethod
+    async def _receive(conn: Connection) -> Tuple[bool, Any]:
+        loop = asyncio.get_running_loop()
+        readable: asyncio.Future[None] = loop.create_future()
+
+        def on_readable():
+            if not readable.done():
+                readable.set_result(None)
+
+        loop.add_reader(conn.fileno(), on_readable)
+        try:
+            await readable
+        finally:
+            loop.remove_reader(conn.fileno())
+        try:
+            return conn.recv()
+        except EOFError:
+            logging.error("A worker process died while running a job")
+            raise